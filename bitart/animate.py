@@ -0,0 +1,115 @@
+import os
+import numpy as np
+from .function import Expression, Lookup
+from .grid import Grid
+from .optimize import simplified
+from .stream import DEFAULT_MAX_KEYS, APNGWriter, PNGWriter, gather_statistics, stream_colormap, stream_encoding, stream_rows
+
+# Animations step the variable t through 0 .. frames-1. Most of a tree
+# usually doesn't involve t, so before the first frame every largest
+# t-free subtree is evaluated once and swapped for a lookup of its stored
+# values; each frame then only evaluates the nodes on the paths to t.
+
+DEFAULT_FRAMES = 120
+DEFAULT_DELAY_MS = 40
+
+class Animation:
+    """Frames of fn over an extent x extent lattice, evaluated by cc's
+    settings. With engines other than numpy every frame is a full evaluation."""
+
+    def __init__(self, cc, fn, frames=DEFAULT_FRAMES, extent=None, max_keys=DEFAULT_MAX_KEYS):
+        self.cc = cc
+        self.fn = fn
+        self.frames = frames
+        self.extent = extent or cc.extent
+        self.max_keys = max_keys
+
+        coords = np.arange(self.extent, dtype=np.int64)
+        self.context = {'x': coords.reshape(1, -1), 'y': coords.reshape(-1, 1)}
+        self.ranges = {'x': (0, self.extent - 1), 'y': (0, self.extent - 1), 't': (0, max(frames - 1, 0))}
+        self.tree = simplified(fn)[0] if cc.optimize else fn
+        # Number of subtrees evaluated once for all frames
+        self.hoisted = 0
+        if cc.engine == 'numpy':
+            self.tree = self._hoist(self.tree)
+
+    def _hoist(self, node):
+        # Replace each largest subtree without t (and with some variable, or
+        # it is a constant the evaluator handles anyway) by a stored result
+        variables = node.variables
+        if 't' in variables:
+            if node.is_binary:
+                return Expression(node.op_symbol, self._hoist(node.lhs), self._hoist(node.rhs))
+            if node.is_unary:
+                return Expression(node.op_symbol, self._hoist(node.rhs))
+            return node
+        if not variables or node.is_lookup:
+            return node
+
+        name = f"_static{self.hoisted}"
+        self.hoisted += 1
+        self.context[name] = node.evaluate_array(self.context, self.ranges)
+        self.ranges[name] = node.value_range(self.ranges)
+        return Lookup(name)
+
+    def frame(self, t):
+        """Grid of frame t"""
+        if self.cc.engine != 'numpy':
+            coords = np.arange(self.extent, dtype=np.int64)
+            return self.cc.evaluate(self.tree, coords, coords, t=t)
+
+        values = self.tree.evaluate_array(dict(self.context, t=np.int64(t)), self.ranges)
+        shape = (self.extent, self.extent)
+        if values.shape != shape:
+            values = np.broadcast_to(values, shape).copy()
+        grid = Grid(self.extent, self.extent, dtype=values.dtype)
+        grid.set_points(values)
+        return grid
+
+    def each_frame(self):
+        for t in range(self.frames):
+            yield t, self.frame(t)
+
+    def statistics(self):
+        """Stats over all frames together, so colours mean the same in each"""
+        size = self.extent * self.extent
+        return gather_statistics(((t * size, grid.points) for t, grid in self.each_frame()), self.max_keys)
+
+    def _encoding(self, mode, stats):
+        # One colormap and PNG mode for every frame, so colours stay put
+        colormap = stream_colormap(self.cc, mode, stats, self.max_keys)
+        return (colormap,) + stream_encoding(colormap)
+
+    def _frame_rows(self, colormap, image_mode):
+        for t, grid in self.each_frame():
+            yield t, stream_rows(colormap, image_mode, grid.values, self.cc.scale)
+
+    def render_apng(self, mode, f, stats=None, delay_ms=DEFAULT_DELAY_MS, level=6):
+        """Write the looping animation as an APNG to the binary file f, one
+        frame at a time; returns the stats used"""
+        if stats is None:
+            stats = self.statistics()
+        colormap, image_mode, palette = self._encoding(mode, stats)
+        size = self.extent * self.cc.scale
+        writer = APNGWriter(f, size, size, self.frames, delay_ms=delay_ms, level=level,
+                            mode=image_mode, palette=palette)
+        for _, rows in self._frame_rows(colormap, image_mode):
+            writer.write_rows(rows)
+            writer.end_frame()
+        writer.close()
+        return stats
+
+    def render_frames(self, mode, directory, stats=None, level=6):
+        """Write frame-NNNN.png files into directory; returns the stats used"""
+        if stats is None:
+            stats = self.statistics()
+        os.makedirs(directory, exist_ok=True)
+        colormap, image_mode, palette = self._encoding(mode, stats)
+        size = self.extent * self.cc.scale
+        digits = len(str(max(self.frames - 1, 0)))
+        for t, rows in self._frame_rows(colormap, image_mode):
+            with open(os.path.join(directory, f"frame-{t:0{digits}d}.png"), 'wb') as f:
+                writer = PNGWriter(f, size, size, level=level, mode=image_mode, palette=palette)
+                writer.write_rows(rows)
+                writer.close()
+        return stats
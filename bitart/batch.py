@@ -0,0 +1,121 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from .cli import make_metadata
+from .compute import ComputeContext, save_png
+from .defaults import PNG_LEVEL
+from .util import derive_seed
+
+# A batch is N images numbered 0..N-1, all derived from one batch seed. Shard
+# k of n produces the images whose index is k modulo n, so any number of
+# machines can split a batch without talking to each other. Each shard
+# appends one JSON line per image to its own manifest; manifests merge into
+# a single catalog.
+
+def image_seed(batch_seed, index):
+    """Seed of image index in a batch"""
+    return derive_seed(batch_seed, 'image', index)
+
+def shard_indices(count, shard, shards):
+    if not (0 <= shard < shards):
+        raise ValueError(f"Shard {shard} out of range for {shards} shards")
+    return range(shard, count, shards)
+
+def manifest_path(outdir, batch_seed, shard, shards):
+    return os.path.join(outdir, f"manifest-{batch_seed}-{shard}-of-{shards}.jsonl")
+
+def read_manifest(path):
+    """Records in a manifest; a line cut short by an interrupted run is dropped"""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+def write_manifest(records, path):
+    # Write-then-rename so a crash never leaves a half-written catalog behind
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record, sort_keys=True) + "\n")
+    os.replace(tmp, path)
+
+def run_shard(batch_seed, count, shard, shards, outdir, depth=4, zoom=1, color=None,
+              reject_bad=True, workers=1, progress=None, dedup=None, png_level=PNG_LEVEL, fast_png=False,
+              catalog=None):
+    """Produce this shard's slice of a batch into outdir and return its manifest
+    records. Images already in the manifest (with their file on disk) are
+    skipped, so rerunning an interrupted shard resumes it. With a dedup
+    index, functions it already holds are not generated again. With a
+    catalog.Catalog, every image made is recorded there too."""
+    os.makedirs(outdir, exist_ok=True)
+    path = manifest_path(outdir, batch_seed, shard, shards)
+
+    # Rewriting drops any torn last line, so appends start on a fresh line
+    records = [r for r in read_manifest(path)
+               if r['file'] is None or os.path.exists(os.path.join(outdir, r['file']))]
+    write_manifest(records, path)
+    done = {r['index'] for r in records}
+
+    # One pool for the whole shard rather than one per image
+    processes = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=processes) if processes > 1 else None
+    try:
+        with open(path, 'a') as manifest:
+            for index in shard_indices(count, shard, shards):
+                if index in done:
+                    continue
+
+                seed = image_seed(batch_seed, index)
+                cc = ComputeContext(depth=depth, reject_bad=reject_bad, scale_power=zoom,
+                                    color_override=color, workers=workers, seed=seed, dedup=dedup,
+                                    executor=executor)
+                image, fn, stats, color_fn, modulo, problem = cc.compute_and_render()
+
+                record = {'batch_seed': batch_seed, 'index': index, 'shard': shard, 'file': None}
+                if image is None:
+                    record.update({'seed': seed, 'problem': problem})
+                else:
+                    record['file'] = f"{batch_seed}-{index:06d}.png"
+                    save_png(image, os.path.join(outdir, record['file']), level=png_level, fast=fast_png)
+                    record.update(make_metadata(fn, stats, color_fn, modulo, depth, problem, zoom,
+                                                seed=cc.last_seed, attempt=cc.last_attempt))
+                    if catalog is not None:
+                        catalog.add(record, os.path.join(outdir, record['file']))
+
+                manifest.write(json.dumps(record, sort_keys=True) + "\n")
+                manifest.flush()
+                records.append(record)
+                if progress:
+                    progress(record)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    return records
+
+def merge_manifests(paths):
+    """One catalog from many manifests: failed slots are left out, and an
+    image is kept once however many shards or reruns produced it. File paths
+    become relative to the current directory, like the manifest paths given."""
+    seen = set()
+    catalog = []
+    records = []
+    for path in paths:
+        for record in read_manifest(path):
+            if record['file'] is not None:
+                record['file'] = os.path.join(os.path.dirname(path), record['file'])
+                records.append(record)
+    for record in sorted(records, key=lambda r: (r['batch_seed'], r['index'])):
+        # The same picture: same equation, rendered the same way
+        key = (record['equation'], record['scale'], record['color_mode'])
+        if key in seen:
+            continue
+        seen.add(key)
+        catalog.append(record)
+    return catalog
@@ -0,0 +1,131 @@
+import io
+import json
+import platform
+import random
+import time
+import numpy as np
+from .compute import ComputeContext, MAX_ZOOM, save_png
+from .generator import FunctionMaker
+from .parser import EquationParser
+from .util import derive_seed
+
+# Reproducible timings of each pipeline stage over a matrix of depth, zoom
+# and colour mode. Candidates come from fixed seeds and equations, so two
+# runs time exactly the same work and their JSON results can be compared
+# stage by stage.
+
+DEPTHS = tuple(range(2, 9))
+ZOOMS = tuple(range(0, MAX_ZOOM + 1))
+MODES = ('onebit', 'gradient', 'rgb')
+EQUATIONS = (
+    "(x ^ y) % 9",
+    "((x * y) & (x + y)) % 7",
+    "((x | y) * (x - y)) ^ ((x & y) + 5)",
+)
+BENCH_SEED = 0xb17a47
+# Stages shorter than this are too noisy to flag
+NOISE_FLOOR = 1e-3
+
+def _best(func, repeat):
+    # Best of repeat runs: the least disturbed by everything else on the machine
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def _add(stages, stage, seconds):
+    stages[stage] = stages.get(stage, 0.0) + seconds
+
+def time_candidates(cc, fns, modes, repeat, stages):
+    """Add each stage's best time over fns into stages"""
+    for fn in fns:
+        seconds, (pixels, histogram) = _best(lambda: cc.compute_with_histogram(fn), repeat)
+        _add(stages, 'compute', seconds)
+        # As the search does it: from the bands' histogram when there is one
+        seconds, stats = _best(lambda: cc.analysis(pixels, histogram), repeat)
+        _add(stages, 'analysis', seconds)
+        seconds, _ = _best(lambda: cc.stripes_count(pixels), repeat)
+        _add(stages, 'stripes', seconds)
+
+        for mode in modes:
+            colormap = cc.create_color_function(mode, stats)
+            seconds, image = _best(lambda: cc.render(pixels, colormap), repeat)
+            _add(stages, f'render:{mode}', seconds)
+            seconds, _ = _best(lambda: save_png(image, io.BytesIO()), repeat)
+            _add(stages, f'save:{mode}', seconds)
+
+def _summarise(cc, count, stages):
+    pixels = count * cc.extent * cc.extent
+    search = sum(stages.get(stage, 0.0) for stage in ('make', 'compute', 'analysis', 'stripes'))
+    return {
+        'candidates': count,
+        'extent': cc.extent,
+        'stages': stages,
+        'pixels_per_s': pixels / stages['compute'] if stages['compute'] else None,
+        'candidates_per_s': count / search if search else None,
+    }
+
+def run_suite(depths=DEPTHS, zooms=ZOOMS, modes=MODES, equations=EQUATIONS, candidates=3, repeat=3, progress=None):
+    """Time the matrix; returns the JSON-ready results dict"""
+    cases = {}
+    for zoom in zooms:
+        for depth in depths:
+            name = f"random-d{depth}-z{zoom}"
+            if progress:
+                progress(name)
+            cc = ComputeContext(depth=depth, scale_power=zoom)
+            stages = {}
+            fns = []
+            for index in range(candidates):
+                seed = derive_seed(BENCH_SEED, depth, index)
+                seconds, fn = _best(lambda: FunctionMaker(depth=depth, rng=random.Random(seed)).make(7), repeat)
+                _add(stages, 'make', seconds)
+                fns.append(fn)
+            time_candidates(cc, fns, modes, repeat, stages)
+            cases[name] = _summarise(cc, candidates, stages)
+
+        for index, equation in enumerate(equations):
+            name = f"equation{index}-z{zoom}"
+            if progress:
+                progress(name)
+            cc = ComputeContext(depth=0, scale_power=zoom)
+            stages = {}
+            time_candidates(cc, [EquationParser().parse(equation)], modes, repeat, stages)
+            cases[name] = _summarise(cc, 1, stages)
+
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'settings': {'depths': list(depths), 'zooms': list(zooms), 'modes': list(modes),
+                     'equations': list(equations), 'candidates': candidates, 'repeat': repeat},
+        'cases': cases,
+    }
+
+def compare(results, baseline, tolerance=0.25, floor=NOISE_FLOOR):
+    """Stages at least tolerance slower than in baseline, as
+    (case, stage, baseline_seconds, seconds) sorted worst first"""
+    regressions = []
+    for name, case in results['cases'].items():
+        before = baseline.get('cases', {}).get(name)
+        if before is None:
+            continue
+        for stage, seconds in case['stages'].items():
+            old = before['stages'].get(stage)
+            if old is None or max(old, seconds) < floor:
+                continue
+            if seconds > old * (1 + tolerance):
+                regressions.append((name, stage, old, seconds))
+    regressions.sort(key=lambda r: r[3] / max(r[2], 1e-12), reverse=True)
+    return regressions
+
+def save_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,104 @@
+import hashlib
+import os
+from collections import OrderedDict
+import numpy as np
+from .grid import Grid
+from .optimize import canonical_form
+from .postfix import Postfix
+
+# Evaluated grids keyed by what determines their values: the function (in
+# canonical form, so equivalent spellings share an entry) and the lattice
+# size. Colour mode plays no part, so re-rendering with another -c is a hit.
+
+DEFAULT_MEMORY_ITEMS = 16
+DEFAULT_DISK_BYTES = 512 * 1024 * 1024
+
+def grid_key(fn, extent, scale):
+    canonical = Postfix.from_tree(canonical_form(fn)).to_bytes()
+    return hashlib.sha256(canonical + f"|{extent}|{scale}".encode('utf-8')).hexdigest()
+
+class GridCache:
+    """Two tiers: an in-memory LRU of the most recent grids and, when a
+    directory is given, .npy files there, evicted oldest-used first once they
+    exceed disk_bytes. Object (big-int) grids are kept in memory only."""
+
+    def __init__(self, directory=None, memory_items=DEFAULT_MEMORY_ITEMS, disk_bytes=DEFAULT_DISK_BYTES):
+        self.directory = directory
+        self.memory_items = memory_items
+        self.disk_bytes = disk_bytes
+        self.memory = OrderedDict()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __getstate__(self):
+        # Worker processes share the disk tier but not our memory
+        state = self.__dict__.copy()
+        state['memory'] = OrderedDict()
+        return state
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def get(self, key):
+        """A fresh Grid for key, or None"""
+        values = self.memory.get(key)
+        if values is not None:
+            self.memory.move_to_end(key)
+        elif self.directory:
+            path = self._path(key)
+            try:
+                values = np.load(path, allow_pickle=False)
+            except (OSError, ValueError):
+                # Missing, evicted by another process, torn or foreign; treat
+                # as a miss and let put() replace it
+                return None
+            try:
+                os.utime(path) # mark as recently used for eviction
+            except FileNotFoundError:
+                pass # evicted since the load; the values are still good
+            self._remember(key, values)
+        else:
+            return None
+
+        height, width = values.shape
+        grid = Grid(width, height, dtype=values.dtype)
+        grid.set_points(values.copy())
+        return grid
+
+    def put(self, key, grid):
+        values = grid.values.copy()
+        self._remember(key, values)
+        if self.directory and values.dtype != object:
+            path = self._path(key)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                np.save(f, values, allow_pickle=False)
+            os.replace(tmp, path)
+            self._evict()
+
+    def _remember(self, key, values):
+        self.memory[key] = values
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def _evict(self):
+        # Other processes may share the directory and evict the same files:
+        # one that vanishes under us is simply gone already
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy"):
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -0,0 +1,178 @@
+import json
+import os
+import re
+import sqlite3
+
+# SQLite catalog of image metadata: one row per image instead of one .yaml
+# file beside it, so a collection of any size is searchable by its stats
+# ("onebit, depth 6, density above 0.5") through indexes rather than by
+# parsing every sidecar. Rows are the make_metadata dicts, keyed by file path.
+
+# Columns filled straight from make_metadata's dict, in table order
+COLUMNS = ('file', 'equation', 'eqn_serialized', 'depth', 'color_mode', 'modulo', 'problem', 'zoom',
+           'scale', 'extent', 'seed', 'attempt', 'num_keys', 'min_key', 'max_key', 'most_common_key',
+           'most_common_key_count', 'density', 'dominance', 'timings')
+
+# Key columns and seed can hold integers beyond SQLite's 64 bits; they have
+# no declared type, so such values are kept exactly, as text
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL UNIQUE,
+    equation TEXT NOT NULL,
+    eqn_serialized TEXT,
+    depth INTEGER,
+    color_mode TEXT,
+    modulo INTEGER,
+    problem TEXT,
+    zoom INTEGER,
+    scale INTEGER,
+    extent INTEGER,
+    seed,
+    attempt INTEGER,
+    num_keys INTEGER,
+    min_key,
+    max_key,
+    most_common_key,
+    most_common_key_count INTEGER,
+    density REAL,
+    dominance REAL,
+    timings TEXT
+);
+CREATE INDEX IF NOT EXISTS images_mode_depth ON images (color_mode, depth);
+CREATE INDEX IF NOT EXISTS images_density ON images (density);
+CREATE INDEX IF NOT EXISTS images_dominance ON images (dominance);
+CREATE INDEX IF NOT EXISTS images_num_keys ON images (num_keys);
+CREATE INDEX IF NOT EXISTS images_zoom ON images (zoom);
+CREATE INDEX IF NOT EXISTS images_equation ON images (equation);
+"""
+
+# Rows buffered by add() before they are written in one transaction
+DEFAULT_BATCH_ROWS = 1000
+
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+def _integer(value):
+    if isinstance(value, int) and not (INT64_MIN <= value <= INT64_MAX):
+        return str(value)
+    return value
+
+def catalog_row(md, file):
+    """Column values of one image's metadata dict, in COLUMNS order"""
+    scale = md.get('scale')
+    row = dict(md, file=file, zoom=scale.bit_length() - 1 if scale else None)
+    # Stored without make_metadata's "f(x,y) = " prefix, which every row shares
+    row['equation'] = re.sub(r'^f\(x,y\) = ', '', md['equation'])
+    for name in ('seed', 'min_key', 'max_key', 'most_common_key'):
+        row[name] = _integer(row.get(name))
+    if row.get('timings') is not None:
+        row['timings'] = json.dumps(row['timings'], sort_keys=True)
+    return tuple(row.get(name) for name in COLUMNS)
+
+class Catalog:
+    def __init__(self, path, batch_rows=DEFAULT_BATCH_ROWS):
+        self.path = path
+        self.batch_rows = batch_rows
+        self.pending = []
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        # One writer appending in big transactions: WAL with NORMAL sync is
+        # crash-safe for the database, and far fewer fsyncs than the default
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __len__(self):
+        self.flush()
+        return self.db.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def add(self, md, file):
+        """Record one image; written with others once batch_rows are pending.
+        An image already in the catalog under file is replaced."""
+        self.pending.append(catalog_row(md, file))
+        if len(self.pending) >= self.batch_rows:
+            self.flush()
+
+    def add_many(self, items):
+        """Record (md, file) pairs, all in as few transactions as batch_rows allows"""
+        for md, file in items:
+            self.add(md, file)
+        self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        columns = ", ".join(COLUMNS)
+        marks = ", ".join("?" * len(COLUMNS))
+        with self.db:
+            self.db.executemany(f"INSERT OR REPLACE INTO images ({columns}) VALUES ({marks})", self.pending)
+        self.pending = []
+
+    def query(self, where=None, params=(), order_by=None, limit=None):
+        """Rows (sqlite3.Row) matching the SQL condition where, with ?
+        placeholders filled from params"""
+        self.flush()
+        sql = "SELECT * FROM images"
+        if where:
+            sql += f" WHERE {where}"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = tuple(params) + (limit,)
+        return self.db.execute(sql, params).fetchall()
+
+    def close(self):
+        if self.db is not None:
+            self.flush()
+            self.db.close()
+            self.db = None
+
+def image_for(mdname):
+    """Image file a .yaml sidecar describes"""
+    base = re.sub(r'\.yaml$', '', mdname)
+    # cli names the sidecar x.yaml for x.png, or x.yaml for an x without .png
+    image = base + ".png" if os.path.exists(base + ".png") or not os.path.exists(base) else base
+    return os.path.normpath(image)
+
+def yaml_files(paths):
+    """.yaml sidecars among paths, searching directories recursively"""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith('.yaml'):
+                    yield os.path.join(root, name)
+
+def import_yaml(catalog, paths, progress=None):
+    """Add the images described by .yaml sidecars (files, or directories of
+    them) to catalog; returns how many were added. Sidecars that aren't
+    bitart metadata are skipped."""
+    import yaml
+    # libyaml's loader when built with it; parsing dominates an import
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+    count = 0
+    for mdname in yaml_files(paths):
+        with open(mdname) as f:
+            md = yaml.load(f, Loader=loader)
+        if not isinstance(md, dict) or 'equation' not in md:
+            if progress:
+                progress(mdname, False)
+            continue
+        catalog.add(md, image_for(mdname))
+        count += 1
+        if progress:
+            progress(mdname, True)
+    catalog.flush()
+    return count
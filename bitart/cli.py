@@ -2,18 +2,18 @@ import click
 import sys
 import os
 import re
-import yaml
-from .compute import ComputeContext, EXTENT, MAX_ZOOM
-from .util import crunch64
-from .parser import EquationParser
+from .defaults import COLOR_MODES, DEFAULT_ZOOM, EXTENT, MAX_ZOOM, PNG_LEVEL
+from .util import crunch64, derive_seed
 
-DEFAULT_ZOOM = 1
+# numpy, PIL, yaml and the compute stack are imported by the commands that
+# use them, so --help and quick subcommands start without loading them all
 
-def make_metadata(fn, stats, mode, modulo, depth, problem, zoom):
+def make_metadata(fn, stats, mode, modulo, depth, problem, zoom, seed=None, attempt=None, timings=None):
     fn_desc = f"f(x,y) = {fn}"
-    fn_serialized = crunch64(safe_yaml_dump(str(fn))) # Ruby does YAML.dump(fn), here fn string representation is what matters mostly or AST dump
-    # Actually Ruby dumps the AST object via YAML. 
-    # For now let's dump the string representation as that's what we have easiest access to without custom representers
+    # Ruby dumps the AST object via YAML; the postfix bytes are the compact
+    # equivalent, and Postfix.from_bytes(uncrunch64(...)) gives the tree back
+    from .postfix import Postfix
+    fn_serialized = crunch64(Postfix.from_tree(fn).to_bytes())
     
     scale = 1 << zoom
     
@@ -27,11 +27,19 @@ def make_metadata(fn, stats, mode, modulo, depth, problem, zoom):
         'scale': scale,
         'extent': EXTENT // scale # integer division
     }
+    if seed is not None:
+        # Enough to regenerate this exact candidate: ComputeContext.make_candidate(seed, attempt)
+        result['seed'] = seed
+        result['attempt'] = attempt
     result.update(stats)
+    if timings is not None:
+        # Tracer.summary() plus the run's counters
+        result['timings'] = timings
     return result
 
 def safe_yaml_dump(obj):
     # Simple wrapper
+    import yaml
     return yaml.dump(obj)
 
 @click.command()
@@ -57,7 +65,8 @@ def main(filename, depth, max_depth, no_meta, command, reject_bad, quiet, zoom):
     # The flag is --keep. 
     pass
 
-@click.command()
+@click.group(invoke_without_command=True)
+@click.pass_context
 @click.option('-o', '--output', 'filename', help="Output filename; defaults to base-64-encoded equation text.")
 @click.option('-d', '--depth', type=int, default=4, help="Set equation depth.")
 @click.option('-m', '--max-depth', type=int, help="Enable random depth selection to the given maximum.")
@@ -67,9 +76,31 @@ def main(filename, depth, max_depth, no_meta, command, reject_bad, quiet, zoom):
 @click.option('-q', '--quiet', is_flag=True, help="Quiet output.")
 @click.option('-z', '--zoom', type=click.IntRange(0, MAX_ZOOM), help="Zoom power (default is random)")
 @click.option('-e', '--equation', help="Custom equation string (e.g. 'x ^ y'). Overrides depth/generator.")
-@click.option('-c', '--color', type=click.Choice(['onebit', 'gradient', 'rgb', 'red', 'green', 'blue', 'cyan', 'magenta', 'yellow', 'orange', 'grey']), help="Force specific color mode.")
-def main(filename, depth, max_depth, no_meta, command, keep, quiet, zoom, equation, color):
-    
+@click.option('-c', '--color', type=click.Choice(COLOR_MODES), help="Force specific color mode.")
+@click.option('--no-screen', is_flag=True, help="Evaluate every candidate on the full grid, skipping the coarse screening pass.")
+@click.option('--no-precheck', is_flag=True, help="Don't reject candidates from the shape of their equation alone.")
+@click.option('-w', '--workers', type=click.IntRange(0), default=1, help="Search candidates on this many processes (0 = all cores).")
+@click.option('-T', '--threads', type=click.IntRange(0), default=0, help="Evaluate each large grid in bands on this many threads (0 = all cores).")
+@click.option('-s', '--seed', type=int, help="Seed for the candidate search; the same seed gives the same image.")
+@click.option('--timings', is_flag=True, help="Time each stage and add the timings to the metadata.")
+@click.option('--trace', 'trace_file', type=click.Path(dir_okay=False), help="Write a Chrome trace-event JSON file of the run's stages.")
+@click.option('--dedup-index', type=click.Path(dir_okay=False), help="Skip functions an image in this index file was already made from, and add new images to it.")
+@click.option('--png-level', type=click.IntRange(0, 9), default=PNG_LEVEL, help="PNG compression level, 0 (none) to 9 (smallest).")
+@click.option('--fast-png', is_flag=True, help="Encode PNGs quickly at some cost in file size; overrides --png-level.")
+@click.option('--catalog', 'catalog_path', type=click.Path(dir_okay=False), help="Record the metadata in this SQLite catalog instead of a .yaml file.")
+@click.option('--cache-dir', envvar='BITART_CACHE_DIR', type=click.Path(file_okay=False), help="Keep evaluated grids here and reuse them for equations seen before (env: BITART_CACHE_DIR).")
+def main(ctx, filename, depth, max_depth, no_meta, command, keep, quiet, zoom, equation, color, no_screen, no_precheck, workers, threads, seed, timings, trace_file, dedup_index, png_level, fast_png, catalog_path, cache_dir):
+    """Generate a bit-art image, or run one of the commands below."""
+    if ctx.invoked_subcommand is not None:
+        return
+
+    import yaml
+    from .cache import GridCache
+    from .compute import ComputeContext, save_png
+    from .dedup import DedupIndex
+    from .parser import EquationParser
+    from .trace import Tracer
+
     def info(msg):
         if not quiet:
             click.echo(msg)
@@ -84,14 +115,18 @@ def main(filename, depth, max_depth, no_meta, command, keep, quiet, zoom, equati
 
     # Logic
     import random
-    
+
+    # With a seed, the random depth and zoom come from it too, so the same
+    # seed gives the same image
+    rng = random.Random(derive_seed(seed, 'cli')) if seed is not None else random
+
     final_depth = depth
     if max_depth:
         # Ruby: [2, rand(opts.max_depth - 1)].max
         # rand(n) returns 0..n-1
         # so rand(max_depth - 1) is 0..(max_depth-2)
         # effectively roughly similar range
-        final_depth = max(2, random.randint(0, max_depth - 2))
+        final_depth = max(2, rng.randint(0, max_depth - 2))
         info(f"Depth: {final_depth}")
 
     # Zoom
@@ -99,18 +134,27 @@ def main(filename, depth, max_depth, no_meta, command, keep, quiet, zoom, equati
     # zoom = rand(MAX_ZOOM + 1) if !opts.zoom && rand() < 0.2
     
     final_zoom = zoom if zoom is not None else DEFAULT_ZOOM
-    if zoom is None and random.random() < 0.2:
-        final_zoom = random.randint(0, MAX_ZOOM)
+    if zoom is None and rng.random() < 0.2:
+        final_zoom = rng.randint(0, MAX_ZOOM)
         
     info(f"Zoom power: {final_zoom} ({'user set' if zoom is not None else 'random'})")
 
     reject_bad_logic = not keep
+    tracer = Tracer() if timings or trace_file else None
 
     cc = ComputeContext(depth=final_depth, 
                         attempts=20, 
                         reject_bad=reject_bad_logic,
                         scale_power=final_zoom,
-                        color_override=color)
+                        color_override=color,
+                        screen=not no_screen,
+                        precheck=not no_precheck,
+                        workers=workers,
+                        threads=threads,
+                        seed=seed,
+                        cache=GridCache(cache_dir) if cache_dir else None,
+                        tracer=tracer,
+                        dedup=DedupIndex(dedup_index) if dedup_index else None)
 
     if equation:
         # Custom equation path
@@ -132,6 +176,17 @@ def main(filename, depth, max_depth, no_meta, command, keep, quiet, zoom, equati
         
     image, fn, stats, color_fn, modulo, problem = result
     
+    prechecked = {key[len('prechecked_'):]: n for key, n in cc.counters.items() if key.startswith('prechecked_')}
+    if prechecked:
+        blabber("Rejected before evaluation: " + ", ".join(f"{n} {reason}" for reason, n in sorted(prechecked.items())))
+    if cc.counters['screened']:
+        blabber(f"Screened {cc.counters['screened']} candidates, "
+                f"avoided {cc.counters['full_evaluations_avoided']} full evaluations")
+    if cc.dedup is not None:
+        blabber(f"Dedup index: {cc.counters['duplicates']} duplicates skipped, "
+                f"{cc.dedup.hit_rate:.1%} hit rate, {len(cc.dedup)} functions known")
+    if cc.counters['nodes_removed']:
+        blabber(f"Simplification removed {cc.counters['nodes_removed']} nodes")
     info(f"Function: f(x,y) := {fn}")
     
     if not filename:
@@ -140,24 +195,311 @@ def main(filename, depth, max_depth, no_meta, command, keep, quiet, zoom, equati
         filename = crunch64(fn_str) + ".png"
         
     info(f"Saving to {filename}...")
-    image.save(filename)
+    with cc.tracer.stage('save'):
+        save_png(image, filename, level=png_level, fast=fast_png)
     
     mdname = re.sub(r'\.png$', '.yaml', filename)
     if mdname == filename: mdname += ".yaml" # fallback if extension weird
     
-    md = make_metadata(fn, stats, color_fn, modulo, final_depth, problem, final_zoom)
+    md = make_metadata(fn, stats, color_fn, modulo, final_depth, problem, final_zoom,
+                       seed=cc.last_seed, attempt=cc.last_attempt,
+                       timings={'stages': tracer.summary(), 'counts': dict(cc.counters)} if timings else None)
     
     info("Metadata:")
     for k, v in md.items():
         info(f"  {k}: {v}")
         
-    if not no_meta:
+    if catalog_path:
+        from .catalog import Catalog
+        info(f"Recording in catalog {catalog_path}...")
+        with Catalog(catalog_path) as catalog:
+            catalog.add(md, filename)
+    elif not no_meta:
         info(f"Writing info file {mdname}...")
         with open(mdname, 'w') as f:
             yaml.dump(md, f, default_flow_style=False)
+
+    if trace_file:
+        info(f"Writing trace {trace_file}...")
+        tracer.write_chrome_trace(trace_file)
             
     if command:
         os.system(f"{command} {filename}")
 
+@main.command()
+@click.option('-s', '--seed', 'batch_seed', type=int, required=True, help="Batch seed; every shard of a batch must use the same one.")
+@click.option('-n', '--count', type=click.IntRange(1), required=True, help="Number of images in the whole batch.")
+@click.option('--shard', type=click.IntRange(0), default=0, help="Index of this shard, from 0.")
+@click.option('--shards', type=click.IntRange(1), default=1, help="Total number of shards.")
+@click.option('-O', '--outdir', default='.', help="Directory for images and the shard manifest.")
+@click.option('-d', '--depth', type=int, default=4, help="Set equation depth.")
+@click.option('-z', '--zoom', type=click.IntRange(0, MAX_ZOOM), default=DEFAULT_ZOOM, help="Zoom power.")
+@click.option('-c', '--color', type=click.Choice(COLOR_MODES), help="Force specific color mode.")
+@click.option('-k', '--keep', is_flag=True, help="Keep the first image, regardless of quality.")
+@click.option('-w', '--workers', type=click.IntRange(0), default=1, help="Search candidates on this many processes (0 = all cores).")
+@click.option('--dedup-index', type=click.Path(dir_okay=False), help="Skip functions an image in this index file was already made from, and add new images to it.")
+@click.option('--png-level', type=click.IntRange(0, 9), default=PNG_LEVEL, help="PNG compression level, 0 (none) to 9 (smallest).")
+@click.option('--fast-png', is_flag=True, help="Encode PNGs quickly at some cost in file size; overrides --png-level.")
+@click.option('--catalog', 'catalog_path', type=click.Path(dir_okay=False), help="Also record every image in this SQLite catalog.")
+@click.option('-q', '--quiet', is_flag=True, help="Quiet output.")
+def batch(batch_seed, count, shard, shards, outdir, depth, zoom, color, keep, workers, dedup_index, png_level, fast_png, catalog_path, quiet):
+    """Produce one shard's slice of a seeded batch of images.
+
+    Rerunning a shard resumes it from its manifest."""
+    from . import batch as batches
+
+    if shard >= shards:
+        raise click.BadParameter(f"must be less than --shards ({shards})", param_hint='--shard')
+
+    def progress(record):
+        if not quiet:
+            click.echo(f"{record['index']}: {record['file'] or record['problem']}")
+
+    from .dedup import DedupIndex
+
+    from .catalog import Catalog
+
+    dedup = DedupIndex(dedup_index) if dedup_index else None
+    catalog = Catalog(catalog_path) if catalog_path else None
+    try:
+        records = batches.run_shard(batch_seed, count, shard, shards, outdir, depth=depth, zoom=zoom,
+                                    color=color, reject_bad=not keep, workers=workers, progress=progress,
+                                    dedup=dedup, png_level=png_level, fast_png=fast_png, catalog=catalog)
+    finally:
+        if catalog is not None:
+            catalog.close()
+    if not quiet:
+        path = batches.manifest_path(outdir, batch_seed, shard, shards)
+        click.echo(f"{len(records)} images recorded in {path}")
+        if dedup is not None:
+            click.echo(f"Dedup index: {dedup.hits} duplicates skipped of {dedup.lookups} candidates "
+                       f"({dedup.hit_rate:.1%})")
+
+@main.command()
+@click.option('-e', '--equation', required=True, help="Equation to render, e.g. the 'equation' line of a metadata file.")
+@click.option('-o', '--output', 'filename', required=True, help="Output PNG filename.")
+@click.option('--size', type=click.IntRange(1), default=8192, help="Image width and height in pixels.")
+@click.option('-z', '--zoom', type=click.IntRange(0, MAX_ZOOM), default=0, help="Zoom power: each value becomes a 2^zoom pixel block.")
+@click.option('-c', '--color', type=click.Choice(COLOR_MODES), help="Colour mode (default: onebit for few values, else gradient).")
+@click.option('--band-rows', type=click.IntRange(1), default=256, help="Rows of values evaluated at a time; bounds memory use.")
+@click.option('--level', type=click.IntRange(0, 9), default=6, help="zlib compression level.")
+@click.option('-q', '--quiet', is_flag=True, help="Quiet output.")
+def poster(equation, filename, size, zoom, color, band_rows, level, quiet):
+    """Render an equation at poster size, streaming it band by band."""
+    from .compute import ComputeContext
+    from .parser import EquationParser
+    from .stream import StreamRenderer
+
+    scale = 1 << zoom
+    if size % scale:
+        raise click.BadParameter(f"must be a multiple of the zoom block size {scale}", param_hint='--size')
+
+    fn = EquationParser().parse(equation)
+    cc = ComputeContext(depth=0, scale_power=zoom)
+    renderer = StreamRenderer(cc, size // scale, band_rows=band_rows)
+
+    if not quiet:
+        click.echo(f"Scanning f(x,y) = {fn} over {size // scale}x{size // scale} values...")
+    stats = renderer.statistics(fn)
+    if not color:
+        color = 'onebit' if stats['num_keys'] is not None and stats['num_keys'] < 30 else 'gradient'
+
+    if not quiet:
+        click.echo(f"Writing {size}x{size} {color} image to {filename}...")
+    with open(filename, 'wb') as f:
+        renderer.render(fn, color, f, stats=stats, level=level)
+
+    if not quiet:
+        for k, v in stats.items():
+            click.echo(f"  {k}: {v}")
+
+@main.command()
+@click.option('-e', '--equation', required=True, help="Equation in x, y and the frame number t, e.g. '(x ^ y) % (t + 2)'.")
+@click.option('-o', '--output', 'filename', default='animation.png', help="Output animated PNG filename.")
+@click.option('--frames', type=click.IntRange(1), default=120, help="Number of frames; t runs from 0 to frames-1.")
+@click.option('--delay', type=click.IntRange(1), default=40, help="Milliseconds per frame.")
+@click.option('--frames-dir', type=click.Path(file_okay=False), help="Write one PNG per frame into this directory instead.")
+@click.option('-z', '--zoom', type=click.IntRange(0, MAX_ZOOM), default=DEFAULT_ZOOM, help="Zoom power.")
+@click.option('-c', '--color', type=click.Choice(COLOR_MODES), help="Colour mode (default: onebit for few values, else gradient).")
+@click.option('--level', type=click.IntRange(0, 9), default=6, help="zlib compression level.")
+@click.option('-q', '--quiet', is_flag=True, help="Quiet output.")
+def animate(equation, filename, frames, delay, frames_dir, zoom, color, level, quiet):
+    """Render an equation of t as a looping animation, frame by frame."""
+    from .animate import Animation
+    from .compute import ComputeContext
+    from .parser import EquationParser
+
+    fn = EquationParser().parse(equation)
+    cc = ComputeContext(depth=0, scale_power=zoom)
+    animation = Animation(cc, fn, frames=frames)
+
+    if not quiet:
+        click.echo(f"Scanning {frames} frames of f(x,y,t) = {fn}...")
+    stats = animation.statistics()
+    if not color:
+        color = 'onebit' if stats['num_keys'] is not None and stats['num_keys'] < 30 else 'gradient'
+
+    if frames_dir:
+        if not quiet:
+            click.echo(f"Writing {frames} {color} frames to {frames_dir}...")
+        animation.render_frames(color, frames_dir, stats=stats, level=level)
+    else:
+        if not quiet:
+            click.echo(f"Writing {frames}-frame {color} animation to {filename}...")
+        with open(filename, 'wb') as f:
+            animation.render_apng(color, f, stats=stats, delay_ms=delay, level=level)
+
+@main.command()
+@click.option('--host', default='127.0.0.1', help="Address to listen on.")
+@click.option('--port', type=int, default=8000, help="TCP port to listen on.")
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False), help="Listen on this Unix socket instead of TCP.")
+@click.option('-w', '--workers', type=click.IntRange(1), default=os.cpu_count() or 1, help="Render processes.")
+@click.option('--cache-items', type=click.IntRange(0), default=256, help="Rendered PNGs kept for repeat requests.")
+@click.option('--max-pending', type=click.IntRange(1), default=32, help="Distinct renders queued or running before answering 503.")
+def serve(host, port, socket_path, workers, cache_items, max_pending):
+    """Serve renders over HTTP: GET /render?equation=...&zoom=...&color=..., GET /metrics."""
+    import asyncio
+    from .service import RenderService
+
+    service = RenderService(workers=workers, cache_items=cache_items, max_pending=max_pending)
+    click.echo(f"Listening on {socket_path or f'http://{host}:{port}'} with {workers} workers")
+    try:
+        asyncio.run(service.serve(host, port, socket_path))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+@main.command()
+@click.option('-o', '--output', default='bench.json', help="Write the results here as JSON.")
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), help="Earlier results to compare against; regressions make the exit status 1.")
+@click.option('--tolerance', type=click.FloatRange(0), default=0.25, help="Slowdown fraction that counts as a regression.")
+@click.option('--candidates', type=click.IntRange(1), default=3, help="Random candidates timed per depth and zoom.")
+@click.option('--repeat', type=click.IntRange(1), default=3, help="Runs per stage; the best one counts.")
+@click.option('--quick', is_flag=True, help="Only depths 2, 5 and 8 at zoom 0 and the maximum zoom.")
+@click.option('-q', '--quiet', is_flag=True, help="Quiet output.")
+def bench(output, baseline, tolerance, candidates, repeat, quick, quiet):
+    """Time every pipeline stage on fixed seeds and equations."""
+    from . import benchmark
+
+    matrix = {'depths': (2, 5, 8), 'zooms': (0, MAX_ZOOM)} if quick else {}
+    progress = None if quiet else (lambda name: click.echo(f"  {name}"))
+    results = benchmark.run_suite(candidates=candidates, repeat=repeat, progress=progress, **matrix)
+    benchmark.save_results(results, output)
+
+    if not quiet:
+        click.echo(f"{'case':<20} {'pixels/s':>14} {'candidates/s':>13}")
+        for name, case in results['cases'].items():
+            candidates_per_s = case['candidates_per_s'] or 0.0
+            click.echo(f"{name:<20} {case['pixels_per_s'] or 0:>14,.0f} {candidates_per_s:>13.1f}")
+        click.echo(f"Results written to {output}")
+
+    if baseline:
+        regressions = benchmark.compare(results, benchmark.load_results(baseline), tolerance)
+        for name, stage, before, after in regressions:
+            click.echo(f"REGRESSION {name} {stage}: {before * 1000:.2f}ms -> {after * 1000:.2f}ms", err=True)
+        if regressions:
+            sys.exit(1)
+        if not quiet:
+            click.echo(f"No regressions against {baseline}")
+
+@main.command()
+def worker():
+    """Render JSON-lines jobs from stdin, one JSON-lines result each on stdout.
+
+    A job is {"output": "a.png", "equation": "x ^ y"} or {"output": "b.png",
+    "depth": 5}, optionally with "zoom", "color", "seed", "keep", "metadata"
+    and an "id" that is echoed back.
+    """
+    from .worker import run_worker
+
+    run_worker(sys.stdin, sys.stdout)
+
+@main.command()
+@click.argument('manifests', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('-o', '--output', default='catalog.jsonl', help="Catalog file to write.")
+def merge(manifests, output):
+    """Merge batch manifests into one deduplicated catalog."""
+    from . import batch as batches
+
+    catalog = batches.merge_manifests(manifests)
+    batches.write_manifest(catalog, output)
+    click.echo(f"{len(catalog)} images in {output}")
+
+# Stats query accepts as --min-/--max- bounds: option suffix -> column
+QUERY_RANGES = (('density', 'density'), ('dominance', 'dominance'), ('keys', 'num_keys'))
+QUERY_ORDER = ('file', 'depth', 'zoom', 'num_keys', 'density', 'dominance', 'most_common_key_count')
+
+@main.command()
+@click.argument('catalog_path', metavar='CATALOG', type=click.Path(exists=True, dir_okay=False))
+@click.option('-c', '--color', 'modes', multiple=True, type=click.Choice(COLOR_MODES), help="Colour mode; repeat for any of several.")
+@click.option('-d', '--depth', type=int, help="Equation depth.")
+@click.option('-z', '--zoom', type=click.IntRange(0, MAX_ZOOM), help="Zoom power.")
+@click.option('--min-density', type=float)
+@click.option('--max-density', type=float)
+@click.option('--min-dominance', type=float)
+@click.option('--max-dominance', type=float)
+@click.option('--min-keys', type=int, help="Fewest distinct values.")
+@click.option('--max-keys', type=int, help="Most distinct values.")
+@click.option('--good', is_flag=True, help="Only images that passed review (no problem recorded).")
+@click.option('--where', help="Extra SQL condition on the images table, e.g. \"modulo IS NOT NULL\".")
+@click.option('--order-by', type=click.Choice(QUERY_ORDER), default='file', help="Sort column.")
+@click.option('--desc', is_flag=True, help="Sort descending.")
+@click.option('-n', '--limit', type=click.IntRange(1), help="At most this many results.")
+@click.option('--json', 'as_json', is_flag=True, help="Print full records as JSON lines instead of file paths.")
+def query(catalog_path, modes, depth, zoom, good, where, order_by, desc, limit, as_json, **bounds):
+    """List catalogued images matching the given filters.
+
+    For example, onebit images of depth 6 with density above 0.5:
+
+        python -m bitart query catalog.db -c onebit -d 6 --min-density 0.5
+    """
+    import json
+    from .catalog import Catalog
+
+    conditions, params = [], []
+    if modes:
+        conditions.append(f"color_mode IN ({', '.join('?' * len(modes))})")
+        params.extend(modes)
+    for column, value in (('depth', depth), ('zoom', zoom)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    for suffix, column in QUERY_RANGES:
+        for bound, op in (('min', '>='), ('max', '<=')):
+            value = bounds[f"{bound}_{suffix}"]
+            if value is not None:
+                conditions.append(f"{column} {op} ?")
+                params.append(value)
+    if good:
+        conditions.append("problem IS NULL")
+    if where:
+        conditions.append(f"({where})")
+
+    with Catalog(catalog_path) as catalog:
+        rows = catalog.query(" AND ".join(conditions), params,
+                             order_by=order_by + (" DESC" if desc else ""), limit=limit)
+    for row in rows:
+        click.echo(json.dumps(dict(row)) if as_json else row['file'])
+
+@main.command('import')
+@click.argument('catalog_path', metavar='CATALOG', type=click.Path(dir_okay=False))
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('-q', '--quiet', is_flag=True, help="Quiet output.")
+def import_metadata(catalog_path, paths, quiet):
+    """Add existing .yaml sidecars (files, or directories searched
+    recursively) to a SQLite catalog, creating it if needed."""
+    from .catalog import Catalog, import_yaml
+
+    def progress(mdname, added):
+        if not added and not quiet:
+            click.echo(f"Skipped {mdname}: not bitart metadata", err=True)
+
+    with Catalog(catalog_path) as catalog:
+        count = import_yaml(catalog, paths, progress=progress)
+        total = len(catalog)
+    if not quiet:
+        click.echo(f"{count} images imported; {total} in {catalog_path}")
+
 if __name__ == '__main__':
     main()
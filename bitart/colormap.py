@@ -0,0 +1,184 @@
+import math
+from functools import partial
+import numpy as np
+
+# A colormap turns grid values into RGB. color(n) colours one value and is the
+# reference; colors(values) does a whole array at once and must agree with it
+# exactly. apply() picks the cheaper of the two: with few distinct values it
+# colours each once through color() and indexes that lookup table.
+#
+# image_mode is the narrowest PIL mode the colours fit: '1' for black and
+# white, 'L' when every colour is a grey. image_array() uses it, or a
+# palette ('P') when an RGB colormap yields few colours, so a PNG of the
+# image stores one byte (or bit) per pixel instead of three.
+
+LUT_MAX_KEYS = 4096
+# Most colours a 'P' image's palette holds
+PALETTE_SIZE = 256
+
+COLORMAPS = {}
+
+def register_colormap(name, factory=None):
+    """Register factory(stats) -> Colormap under name; usable as a decorator"""
+    if factory is None:
+        return lambda f: register_colormap(name, f)
+    COLORMAPS[name] = factory
+    return factory
+
+def colormap_names():
+    return list(COLORMAPS)
+
+def create_colormap(mode, stats):
+    factory = COLORMAPS.get(mode, Fallback)
+    return factory(stats)
+
+class Colormap:
+    image_mode = 'RGB'
+
+    def __init__(self, stats):
+        self.min_key = stats['min_key']
+        self.max_key = stats['max_key']
+        self.most_common = stats['most_common_key']
+        self.num_keys = stats['num_keys']
+
+        self.denom = float(self.max_key - self.min_key)
+        if self.denom == 0: self.denom = 1.0
+
+    def __call__(self, n):
+        # Still usable as the old per-value colour function
+        return self.color(n)
+
+    def color(self, n):
+        raise NotImplementedError
+
+    def colors(self, values):
+        """(..., 3) array of channel values; override for a vectorized version"""
+        flat = [self.color(n) for n in values.reshape(-1).tolist()]
+        return np.array(flat, dtype=np.int64).reshape(values.shape + (3,))
+
+    def apply(self, values):
+        """RGB uint8 array of shape values.shape + (3,)"""
+        if self.num_keys <= LUT_MAX_KEYS:
+            keys, inverse = np.unique(values, return_inverse=True)
+            lut = np.array([self.color(key) for key in keys.tolist()], dtype=np.uint8).reshape(-1, 3)
+            return lut[inverse.reshape(values.shape)]
+        return self.colors(values).astype(np.uint8)
+
+    def image_array(self, values):
+        """(array, mode, palette) for the most compact image of values. In
+        mode '1' or 'L' the array holds grey levels (0 or 255 for '1'), in
+        'P' indices into palette, an (n, 3) uint8 array, else RGB triples."""
+        if self.num_keys > LUT_MAX_KEYS:
+            rgb = self.colors(values).astype(np.uint8)
+            if self.image_mode != 'RGB':
+                return rgb[..., 0], self.image_mode, None
+            return rgb, 'RGB', None
+
+        keys, inverse = np.unique(values, return_inverse=True)
+        inverse = inverse.reshape(values.shape)
+        lut = np.array([self.color(key) for key in keys.tolist()], dtype=np.uint8).reshape(-1, 3)
+        if self.image_mode != 'RGB':
+            return lut[:, 0][inverse], self.image_mode, None
+        palette, index = np.unique(lut, axis=0, return_inverse=True)
+        if len(palette) <= PALETTE_SIZE:
+            return index.reshape(-1).astype(np.uint8)[inverse], 'P', palette
+        return lut[inverse], 'RGB', None
+
+    def magnitudes(self, values):
+        """(n - min_key) / denom clamped to [0, 1], as float64, with the same
+        rounding as the scalar code"""
+        if values.dtype == object or self.max_key - self.min_key > np.iinfo(np.int64).max:
+            # The difference itself may not fit int64; keep it exact
+            offset = (values.astype(object) - self.min_key).astype(np.float64)
+        else:
+            # Widen first: a narrow dtype can't hold the difference
+            offset = (values.astype(np.int64) - self.min_key).astype(np.float64)
+        return np.clip(offset / self.denom, 0.0, 1.0)
+
+    def magnitude(self, n):
+        mag = (n - self.min_key) / self.denom
+        return max(0.0, min(1.0, mag))
+
+@register_colormap('onebit')
+class OneBit(Colormap):
+    image_mode = '1'
+    BLACK = (0, 0, 0)
+    WHITE = (255, 255, 255)
+
+    def color(self, n):
+        return self.BLACK if n == self.most_common else self.WHITE
+
+    def colors(self, values):
+        level = np.where(values == self.most_common, 0, 255)
+        return np.repeat(level[..., np.newaxis], 3, axis=-1)
+
+@register_colormap('gradient')
+class Gradient(Colormap):
+    image_mode = 'L'
+
+    def color(self, n):
+        val = int(self.magnitude(n) * 255)
+        return (val, val, val)
+
+    def colors(self, values):
+        level = (self.magnitudes(values) * 255).astype(np.int64)
+        return np.repeat(level[..., np.newaxis], 3, axis=-1)
+
+@register_colormap('rgb')
+class Spectral(Colormap):
+    # Procedural sine palette: R follows t, G peaks in the middle, B fades out
+    def color(self, n):
+        t = self.magnitude(n)
+        r = int(255 * t)
+        g = int(255 * math.sin(math.pi * t))
+        b = int(255 * math.cos(0.5 * math.pi * t))
+        return (r, g, b)
+
+    def colors(self, values):
+        t = self.magnitudes(values)
+        return np.stack([(255 * t).astype(np.int64),
+                         (255 * np.sin(np.pi * t)).astype(np.int64),
+                         (255 * np.cos(0.5 * np.pi * t)).astype(np.int64)], axis=-1)
+
+class SingleGradient(Colormap):
+    def __init__(self, stats, scales):
+        super().__init__(stats)
+        self.scales = scales
+        # Equal scales give equal channels
+        if len(set(scales)) == 1:
+            self.image_mode = 'L'
+
+    def color(self, n):
+        mag = self.magnitude(n)
+        r_s, g_s, b_s = self.scales
+        return (int(mag * 255 * r_s), int(mag * 255 * g_s), int(mag * 255 * b_s))
+
+    def colors(self, values):
+        level = self.magnitudes(values) * 255
+        return np.stack([(level * s).astype(np.int64) for s in self.scales], axis=-1)
+
+# Single colour gradients: name -> (r_scale, g_scale, b_scale)
+SINGLE_COLORS = {
+    'red': (1.0, 0.0, 0.0),
+    'green': (0.0, 1.0, 0.0),
+    'blue': (0.0, 0.0, 1.0),
+    'cyan': (0.0, 1.0, 1.0),
+    'magenta': (1.0, 0.0, 1.0),
+    'yellow': (1.0, 1.0, 0.0),
+    'orange': (1.0, 0.647, 0.0), # Approximately 255, 165, 0
+    'grey': (1.0, 1.0, 1.0),     # Same as gradient
+    'gray': (1.0, 1.0, 1.0)
+}
+
+for _name, _scales in SINGLE_COLORS.items():
+    register_colormap(_name, partial(SingleGradient, scales=_scales))
+
+class Fallback(Colormap):
+    image_mode = 'L'
+    GREY = (128, 128, 128)
+
+    def color(self, n):
+        return self.GREY
+
+    def colors(self, values):
+        return np.broadcast_to(np.array(self.GREY, dtype=np.int64), values.shape + (3,))
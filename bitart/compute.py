@@ -1,63 +1,296 @@
+import os
 import random
-from PIL import Image, ImageDraw
-from .grid import Grid
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import reduce
+import numpy as np
+from PIL import Image
+from .cache import grid_key
+from .colormap import Colormap, create_colormap
+from .dedup import function_key, owner_key
+from .function import context_ranges
+from .defaults import EXTENT, MAX_ZOOM, PNG_LEVEL
+from .grid import Grid, Histogram
 from .generator import FunctionMaker
+from .optimize import simplified
+from .postfix import Postfix
+from .precheck import is_constant
+from .ranges import dtype_for
+from .trace import NULL_TRACER, Tracer
+from .util import derive_seed
 
-EXTENT = 512
-MAX_ZOOM = 3
+# 'numpy' evaluates each node once over whole coordinate arrays,
+# 'postfix' does the same from the flat postfix form on a stack,
+# 'python' runs the tree compiled to a flat function once per pixel.
+ENGINES = ('numpy', 'postfix', 'python')
+
+# Coarse screening looks at a sparse lattice of SCREEN_FRACTION of the rows
+# and columns (at least SCREEN_MIN_SIDE of each), always including the first
+# and last of both, where x or y being 0 trips the safe_div/safe_mod special
+# cases. Only a sample holding a single value is rejected: any high-dominance
+# threshold on a sample also threw away images review_image accepts (a 64x64
+# sample at 0.9998 of a grid at 0.9738), making the result depend on
+# --no-screen. Its problems say they were screened, never proven.
+SCREEN_FRACTION = 4
+SCREEN_MIN_SIDE = 64
+
+# review_image calls an image striped when more than STRIPE_FRACTION of its
+# rows or columns repeat a pattern of at most STRIPE_MAX_PATTERN values
+STRIPE_MAX_PATTERN = 16
+STRIPE_FRACTION = 0.95
+
+# evaluate splits grids of at least BAND_MIN_PIXELS into one horizontal band
+# per thread. numpy releases the GIL inside its integer loops (and sorts), so
+# the bands run in parallel; smaller grids aren't worth the hand-off.
+BAND_MIN_PIXELS = 1 << 16
+
+# zlib strategy for save_png(fast=True): Z_RLE
+PNG_FAST_STRATEGY = 3
+
+def attempt_seed(seed, attempt):
+    """Seed for one attempt of a run, derived from the run's seed"""
+    return derive_seed(seed, attempt)
+
+def _try_candidate(cc, seed, attempt, made=None):
+    # Runs in a worker process; counters and trace events travel back with the result
+    cc.counters = Counter()
+    # The processes already share out the cores
+    cc.threads = max(1, cc.threads // cc.workers)
+    if cc.tracer.enabled:
+        cc.tracer = Tracer()
+    return cc.try_candidate(seed, attempt, made), cc.counters, getattr(cc.tracer, 'events', ())
+
+def problem_reason(problem):
+    """Short name of a review_image problem, for counting rejections"""
+    for prefix, reason in (("Solid", 'solid'), ("Dominance", 'dominance'), ("Image is mostly stripes", 'stripes'),
+                           ("Duplicate", 'duplicate'), ("Screened", 'screened')):
+        if problem.startswith(prefix):
+            return reason
+    return 'other'
+
+def make_image(array, mode, palette=None):
+    """PIL image from one of Colormap.image_array's (array, mode, palette)"""
+    height, width = array.shape[:2]
+    if mode == '1':
+        # PIL's raw '1' rows are bits, most significant first, padded to a byte
+        return Image.frombytes('1', (width, height), np.packbits(array > 0, axis=1).tobytes())
+    if mode == 'P':
+        image = Image.frombytes('P', (width, height), np.ascontiguousarray(array, dtype=np.uint8).tobytes())
+        image.putpalette(palette.tobytes())
+        return image
+    return Image.fromarray(array, mode)
+
+def save_png(image, f, level=PNG_LEVEL, fast=False):
+    """Write image as a PNG to a path or file object. fast trades a larger
+    file for a quicker encode: zlib's lowest effort with run-length matching,
+    which suits images made of flat runs."""
+    if fast:
+        image.save(f, format='PNG', compress_level=1, compress_type=PNG_FAST_STRATEGY)
+    else:
+        image.save(f, format='PNG', compress_level=level)
 
 class ComputeContext:
-    def __init__(self, depth, attempts=20, reject_bad=True, scale_power=0, color_override=None):
+    def __init__(self, depth, attempts=20, reject_bad=True, scale_power=0, color_override=None, engine='numpy', screen=True,
+                 workers=1, seed=None, optimize=True, cache=None, precheck=True, tracer=None, dedup=None,
+                 threads=None, executor=None):
         self.depth = depth
         self.attempts = attempts
         self.reject_bad = reject_bad
         self.scale = 1 << scale_power
         self.extent = EXTENT // self.scale
         self.color_override = color_override
+        self.engine = engine
+        self.screen = screen
+        # Reject trees whose verdict follows from their shape before evaluating
+        self.precheck = precheck
+        # Candidate search runs on this many processes; 0 or None means all cores
+        self.workers = workers or os.cpu_count() or 1
+        # Optional long-lived process pool for the search, shared by every
+        # compute_and_render call (and other contexts); else one per search
+        self.executor = executor
+        # Bands of one large grid are evaluated on this many threads; 0 or None means all cores
+        self.threads = threads or os.cpu_count() or 1
+        self.seed = seed
+        # Fold constants and drop degenerate subtrees before evaluating
+        self.optimize = optimize
+        # Optional GridCache consulted before evaluating a full grid
+        self.cache = cache
+        # Seed and winning attempt of the last compute_and_render run
+        self.last_seed = None
+        self.last_attempt = None
+        # Work counters, e.g. how many full evaluations screening avoided
+        self.counters = Counter()
+        # Per-stage wall/CPU timings; a trace.Tracer to record them
+        self.tracer = tracer or NULL_TRACER
+        # Optional dedup.DedupIndex of functions already generated; repeats are rejected unevaluated
+        self.dedup = dedup
         
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
         if scale_power > MAX_ZOOM:
             raise ValueError(f"Scale too high! Max {MAX_ZOOM}")
 
+    def __getstate__(self):
+        # Workers get the settings, not the pool they run in
+        state = self.__dict__.copy()
+        state['executor'] = None
+        return state
+
     def compute_and_render(self):
-        pixels = None
-        stats = None
-        fn = None
-        modulo = None
-        problem = None
-
-        for attempt in range(1, self.attempts + 1):
-            if random.random() < 0.1: # Small chance of no modulo
-                 modulo = None
-            else:
-                 modulo = random.randint(2, 13)
+        seed = self.seed if self.seed is not None else random.getrandbits(64)
+        self.last_seed, self.last_attempt = seed, None
 
-            fn = FunctionMaker(depth=self.depth).make(modulo)
-            
-            # Compute grid
-            pixels = self.compute(fn)
-            stats = pixels.analysis()
-            
-            problem = self.review_image(pixels, stats)
-            if not (self.reject_bad and problem):
-                break
-                
-            # If we reached here and reject_bad is true, we loop again
-            if attempt == self.attempts:
+        search = self.search(seed)
+        try:
+            for attempt, (fn, modulo, pixels, stats, problem) in search:
+                self.counters['attempts'] += 1
+                if not (self.reject_bad and problem):
+                    break
+                self.counters['rejected_' + problem_reason(problem)] += 1
+            else:
                 # Unable to produce interesting pattern
                 return None, None, None, None, None, "Failed to generate interesting pattern"
+        finally:
+            # Stops any candidates still queued or running
+            search.close()
+        self.last_attempt = attempt
+        # Only the accepted function is recorded, once the search has settled,
+        # so what the index holds never depends on how far workers ran ahead
+        self.record_function(fn, seed, attempt)
 
         color_fn_type = self.choose_color_function(stats, modulo)
         color_func = self.create_color_function(color_fn_type, stats)
-        image = self.render(pixels, color_func)
-        
-
+        with self.tracer.stage('render'):
+            image = self.render(pixels, color_func)
         
         return image, fn, stats, color_fn_type, modulo, problem
 
+    def search(self, seed):
+        """Yield (attempt, candidate) in attempt order, trying candidates on a
+        process pool when workers > 1. Closing the generator cancels whatever
+        is still outstanding."""
+        attempts = range(1, self.attempts + 1)
+        if self.workers <= 1 or not self.reject_bad:
+            for attempt in attempts:
+                made = self.made_for_dedup(seed, attempt)
+                yield attempt, self.check_duplicate(seed, attempt, made) or self.try_candidate(seed, attempt, made)
+            return
+
+        executor = self.executor or ProcessPoolExecutor(max_workers=self.workers)
+        pending = deque()
+        try:
+            for attempt in attempts:
+                # Duplicates are settled here; only the dedup index's owner knows them
+                made = self.made_for_dedup(seed, attempt)
+                duplicate = self.check_duplicate(seed, attempt, made)
+                future = None if duplicate else executor.submit(_try_candidate, self, seed, attempt, made)
+                pending.append((attempt, future, duplicate))
+                # Keep every worker busy with one spare, but never run further ahead
+                if len(pending) > self.workers:
+                    yield self._collect(*pending.popleft())
+            while pending:
+                yield self._collect(*pending.popleft())
+        finally:
+            if executor is self.executor:
+                # Shared pool: drop what hasn't started; what has finishes in
+                # the pool's own processes, so nothing runs beside them
+                for _, future, _ in pending:
+                    if future is not None:
+                        future.cancel()
+            else:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def _collect(self, attempt, future, duplicate):
+        if duplicate:
+            return attempt, duplicate
+        candidate, counters, events = future.result()
+        self.counters.update(counters)
+        self.tracer.merge(events)
+        return attempt, candidate
+
+    def made_for_dedup(self, seed, attempt):
+        """This attempt's (fn, modulo) when the dedup index will be consulted,
+        else None; try_candidate reuses it rather than making it again"""
+        if self.dedup is None or not self.reject_bad:
+            return None
+        with self.tracer.stage('make'):
+            return self.make_candidate(seed, attempt)
+
+    def check_duplicate(self, seed, attempt, made):
+        """A rejected candidate if an image made by another attempt used
+        this attempt's function (in canonical form, at this scale), else None.
+        made is made_for_dedup's result; nothing is checked without one."""
+        if made is None:
+            return None
+        fn, modulo = made
+        if not self.dedup.is_duplicate(function_key(fn, self.scale), owner_key(seed, attempt)):
+            return None
+        self.counters['duplicates'] += 1
+        self.counters['full_evaluations_avoided'] += 1
+        return fn, modulo, None, None, "Duplicate of an earlier function"
+
+    def record_function(self, fn, seed, attempt):
+        """Note in the dedup index (if any) that an image was made of fn"""
+        if self.dedup is not None:
+            self.dedup.record(function_key(fn, self.scale), owner_key(seed, attempt))
+
+    def make_candidate(self, seed, attempt):
+        """The (fn, modulo) tried at a given attempt of a run with this seed.
+        Each attempt has its own derived seed, so it can be reproduced alone."""
+        rng = random.Random(attempt_seed(seed, attempt))
+        if rng.random() < 0.1: # Small chance of no modulo
+             modulo = None
+        else:
+             modulo = rng.randint(2, 13)
+
+        fn = FunctionMaker(depth=self.depth, rng=rng).make(modulo)
+        return fn, modulo
+
+    def try_candidate(self, seed, attempt, made=None):
+        """Make and evaluate one candidate: (fn, modulo, pixels, stats, problem).
+        pixels and stats are None when the precheck or screening already
+        rejected it. made is the attempt's (fn, modulo) if already made."""
+        with self.tracer.stage('attempt', attempt=attempt):
+            return self._attempt(seed, attempt, made)
+
+    def _attempt(self, seed, attempt, made=None):
+        tracer = self.tracer
+        if made is None:
+            with tracer.stage('make'):
+                made = self.make_candidate(seed, attempt)
+        fn, modulo = made
+
+        # Some trees are boring by construction; no grid needed to tell
+        if self.reject_bad and self.precheck:
+            with tracer.stage('precheck'):
+                problem = self.precheck_candidate(fn)
+            if problem:
+                return fn, modulo, None, None, problem
+
+        # Cheap look at a sparse lattice first; only survivors get the full grid
+        if self.reject_bad and self.screen:
+            with tracer.stage('screen'):
+                problem = self.screen_candidate(fn)
+            if problem:
+                return fn, modulo, None, None, problem
+
+        # Compute grid
+        with tracer.stage('compute'):
+            pixels, histogram = self.compute_with_histogram(fn)
+        with tracer.stage('analysis'):
+            stats = self.analysis(pixels, histogram)
+        self.counters['full_evaluations'] += 1
+
+        with tracer.stage('review'):
+            problem = self.review_image(pixels, stats)
+        return fn, modulo, pixels, stats, problem
+
     def render_custom(self, fn):
         # Render a specific function without the random loop
-        pixels = self.compute(fn)
-        stats = pixels.analysis()
+        with self.tracer.stage('compute'):
+            pixels, histogram = self.compute_with_histogram(fn)
+        with self.tracer.stage('analysis'):
+            stats = self.analysis(pixels, histogram)
         
         # We don't really have a modulo from generation, but we can try to guess it or just default
         # For coloring, we need to pick a strategy.
@@ -78,77 +311,232 @@ class ComputeContext:
              color_fn_type = 'gradient'
              
         color_func = self.create_color_function(color_fn_type, stats)
-        image = self.render(pixels, color_func)
+        with self.tracer.stage('render'):
+            image = self.render(pixels, color_func)
         
-        problem = self.review_image(pixels, stats)
+        with self.tracer.stage('review'):
+            problem = self.review_image(pixels, stats)
         
         return image, fn, stats, color_fn_type, modulo, problem
 
     def compute(self, function):
         # function is a plotfn object, clear callable
-        results = Grid(self.extent, self.extent)
-        # We need to pass a context dict to function
-        # optimization: use map_inplace
-        def mapper(x, y, val):
-            return function({'x': x, 'y': y})
-        
-        results.map_inplace(mapper)
-        return results
+        return self.compute_with_histogram(function)[0]
+
+    def compute_with_histogram(self, function):
+        """(grid, histogram) of function over the full lattice; histogram is
+        the Histogram banded evaluation gathered on the way, or None"""
+        if self.cache is not None:
+            key = grid_key(function, self.extent, self.scale)
+            results = self.cache.get(key)
+            if results is not None:
+                self.counters['cache_hits'] += 1
+                return results, None
+            self.counters['cache_misses'] += 1
+
+        coords = np.arange(self.extent, dtype=np.int64)
+        if self.optimize:
+            self.counters['nodes_removed'] += simplified(function)[1]
+        results, histogram = self.evaluate_with_histogram(function, coords, coords)
+        if self.cache is not None:
+            self.cache.put(key, results)
+        return results, histogram
+
+    def analysis(self, pixels, histogram=None):
+        """pixels.analysis(), from histogram instead when evaluation already
+        gathered one, saving a second pass over the pixels"""
+        return histogram.analysis() if histogram is not None else pixels.analysis()
+
+    def evaluate(self, function, xs, ys, t=0):
+        """Grid of function's values on the lattice of coordinates xs by ys,
+        at frame t"""
+        return self.evaluate_with_histogram(function, xs, ys, t)[0]
+
+    def evaluate_with_histogram(self, function, xs, ys, t=0):
+        """(grid, histogram) like compute_with_histogram, for evaluate"""
+        results = Grid(len(xs), len(ys))
+        if self.optimize:
+            # Same values, fewer nodes; function itself keeps its original text
+            function = simplified(function)[0]
+        if self.engine in ('numpy', 'postfix'):
+            # Grid is row-major, so arrays are indexed [y, x]. x is a row and
+            # y a column: subtrees that use only one of them are evaluated as
+            # 1-D vectors and broadcast to 2-D where they meet the other.
+            shape = (len(ys), len(xs))
+            context = {'x': np.asarray(xs, dtype=np.int64).reshape(1, -1),
+                       'y': np.asarray(ys, dtype=np.int64).reshape(-1, 1),
+                       't': np.int64(t)}
+            if self.engine == 'postfix':
+                function = Postfix.from_tree(function)
+            ranges = context_ranges(context)
+            bands = self.bands(len(ys), len(xs))
+            dtype = dtype_for(*function.value_range(ranges))
+            if len(bands) > 1 and dtype != object:
+                # Object arrays hold the GIL, so only fixed-width results are banded
+                return self._evaluate_bands(function, context, ranges, bands, np.dtype(dtype))
+            values = function.evaluate_array(context, ranges)
+            if values.shape != shape:
+                values = np.broadcast_to(values, shape).copy()
+            # Keep the narrow dtype range analysis picked
+            results = Grid(len(xs), len(ys), dtype=values.dtype)
+            results.set_points(values)
+            return results, None
+
+        # Per-pixel path: one flat generated function instead of a tree walk
+        f = function.compile()
+        xs, ys = np.asarray(xs).tolist(), np.asarray(ys).tolist()
+        results.set_points([f(x, y, t) for y in ys for x in xs])
+        return results, None
+
+    def bands(self, height, width):
+        """(start, stop) rows of the bands evaluate splits a grid into"""
+        count = min(self.threads, height) if height * width >= BAND_MIN_PIXELS else 1
+        edges = [height * i // count for i in range(count + 1)]
+        return list(zip(edges, edges[1:]))
+
+    def _evaluate_bands(self, function, context, ranges, bands, dtype):
+        # Every band writes its rows straight into one shared buffer and
+        # returns the histogram of them; those merge into the whole grid's,
+        # handed back beside it so analysis needs no second pass
+        width = context['x'].size
+        values = np.empty((bands[-1][1], width), dtype=dtype)
+
+        def band(rows):
+            start, stop = rows
+            # The full grid's ranges keep every band in the same dtypes
+            values[start:stop] = function.evaluate_array(dict(context, y=context['y'][start:stop]), ranges)
+            return Histogram.of(values[start:stop].reshape(-1), offset=start * width)
+
+        with ThreadPoolExecutor(max_workers=len(bands)) as pool:
+            histograms = list(pool.map(band, bands))
+        self.counters['bands'] += len(bands)
+
+        results = Grid(width, bands[-1][1], dtype=dtype)
+        results.set_points(values.reshape(-1))
+        return results, reduce(Histogram.merge, histograms)
+
+    def precheck_candidate(self, fn):
+        """review_image's verdict on fn when it follows without evaluating the
+        grid, else None. Unlike screening this is exact, never a guess: a
+        constant tree is a solid colour, and a tree of only x (or only y) has
+        identical rows (columns), so one of them decides everything."""
+        tree = simplified(fn)[0] if self.optimize else fn
+        extent = self.extent
+        if is_constant(tree, {'x': (0, extent - 1), 'y': (0, extent - 1)}):
+            return self._prechecked('solid', "Solid colour")
+
+        variables = tree.variables
+        if len(variables) != 1:
+            return None
+
+        coords = np.arange(extent, dtype=np.int64)
+        by_x = variables == {'x'}
+        if by_x:
+            line = self.evaluate(tree, coords, coords[:1])
+        else:
+            line = self.evaluate(tree, coords[:1], coords)
+        # The full grid holds the line extent times over, in the same order
+        histogram = Histogram.of(line.points)
+        histogram.counts *= extent
+        stats = histogram.analysis()
+
+        problem = self.review_stats(stats)
+        if problem:
+            reason = 'solid' if stats['num_keys'] <= 1 else 'dominance'
+            return self._prechecked(reason, problem)
+
+        # Every column (row) is constant; the rows (columns) are all the line
+        periodic = bool(line.repeated_patterns(vertical=not by_x, maxlen=STRIPE_MAX_PATTERN)[0])
+        across = extent if periodic else 0
+        hcount, vcount = (across, extent) if by_x else (extent, across)
+        return self._prechecked('stripes', self.review_stripes(hcount, vcount))
+
+    def _prechecked(self, reason, problem):
+        self.counters['prechecked_' + reason] += 1
+        self.counters['full_evaluations_avoided'] += 1
+        return problem
+
+    def screen_lattice(self):
+        """Sorted x and y coordinates sampled for screening, or None when the
+        image is too small for a sample to be worth it"""
+        side = max(self.extent // SCREEN_FRACTION, SCREEN_MIN_SIDE)
+        if side >= self.extent:
+            return None
+        # Random rather than evenly spaced rows/columns, so bit patterns and
+        # small moduli can't alias with the step. Seeded, so runs repeat.
+        rng = np.random.default_rng(self.extent)
+        ends = [0, self.extent - 1]
+        xs = np.sort(np.concatenate([ends, 1 + rng.choice(self.extent - 2, side - 2, replace=False)]))
+        ys = np.sort(np.concatenate([ends, 1 + rng.choice(self.extent - 2, side - 2, replace=False)]))
+        return xs.astype(np.int64), ys.astype(np.int64)
+
+    def screen_candidate(self, fn):
+        """Return a review_image-style problem if fn is clearly boring on the
+        screening lattice, else None. Never a final verdict."""
+        lattice = self.screen_lattice()
+        if lattice is None:
+            return None
+
+        self.counters['screened'] += 1
+        stats = self.evaluate(fn, *lattice).analysis()
+        if stats['num_keys'] > 1:
+            return None
+
+        self.counters['full_evaluations_avoided'] += 1
+        return f"Screened: a single value on a {len(lattice[0])}x{len(lattice[1])} sample"
 
     def render(self, pixels, color_func):
-        # Create image
-        image = Image.new("RGB", (self.extent * self.scale, self.extent * self.scale))
-        draw = ImageDraw.Draw(image)
-        
-        for x, y, val in pixels.each_pos():
-            color = color_func(val)
-            # PIL rectangle is [x0, y0, x1, y1] inclusive or similar?
-            # PIL rectangle: [x0, y0, x1, y1] where second point is just outside logic usually but 
-            # documentation says: The second point is just outside the drawn rectangle.
-            
-            scale = self.scale
-            x0 = x * scale
-            y0 = y * scale
-            x1 = (x + 1) * scale - 1 
-            y1 = (y + 1) * scale - 1
-            
-            # Draw can take [x0, y0, x1, y1]
-            draw.rectangle([x0, y0, x1, y1], fill=color, outline=None) # No outline to match solid blocks
-            
-        return image
+        """Image of pixels in the narrowest mode color_func allows ('1', 'L',
+        'P' or 'RGB'); its colours are the same whichever it is"""
+        values = pixels.values
+        if isinstance(color_func, Colormap):
+            array, mode, palette = color_func.image_array(values)
+        else:
+            # Plain per-value function: colour each distinct value once, then
+            # index that palette with the whole grid
+            keys, inverse = np.unique(values, return_inverse=True)
+            lut = np.array([color_func(key) for key in keys.tolist()], dtype=np.uint8).reshape(-1, 3)
+            array, mode, palette = lut[inverse.reshape(values.shape)], 'RGB', None
+
+        # Nearest-neighbour upscale: every cell becomes a scale x scale block
+        if self.scale > 1:
+            array = array.repeat(self.scale, axis=0).repeat(self.scale, axis=1)
+
+        return make_image(array, mode, palette)
 
     def stripes_count(self, pixels):
-        max_pattern = 16
-        fraction = 0.95
-        
-        hcount = 0
-        vcount = 0
-        
-        # Check rows for horizontal stripes logic (this seems to be checking if whole ROW is a repeating pattern?)
-        # Wait, repeated_pattern takes an index and vertical boolean.
-        # If vertical=True, it takes column at `index`.
-        
-        for i in range(self.extent):
-             if pixels.repeated_pattern(i, vertical=True, maxlen=max_pattern):
-                 vcount += 1
-             if pixels.repeated_pattern(i, vertical=False, maxlen=max_pattern):
-                 hcount += 1
-                 
-        striped = (vcount / self.extent > fraction) or (hcount / self.extent > fraction)
+        with self.tracer.stage('stripes'):
+            return self._stripes_count(pixels)
+
+    def _stripes_count(self, pixels):
+        # vertical=True checks each column, vertical=False each row; all at once
+        vcount = int(pixels.repeated_patterns(vertical=True, maxlen=STRIPE_MAX_PATTERN).sum())
+        hcount = int(pixels.repeated_patterns(vertical=False, maxlen=STRIPE_MAX_PATTERN).sum())
+
+        striped = (vcount / self.extent > STRIPE_FRACTION) or (hcount / self.extent > STRIPE_FRACTION)
         return striped, hcount, vcount
 
     def review_image(self, pixels, stats):
-        if stats['num_keys'] <= 1:
-            return "Solid colour"
-        if stats['dominance'] > 0.98:
-            return f"Dominance too high: {stats['dominance']}"
+        problem = self.review_stats(stats)
+        if problem:
+            return problem
             
         striped, hcount, vcount = self.stripes_count(pixels)
         if striped:
-            return f"Image is mostly stripes ({hcount}, {vcount})"
+            return self.review_stripes(hcount, vcount)
             
         return None
 
+    def review_stats(self, stats):
+        if stats['num_keys'] <= 1:
+            return "Solid colour"
+        if stats['dominance'] > 0.98:
+            return f"Dominance too high: {stats['dominance']}"
+        return None
+
+    def review_stripes(self, hcount, vcount):
+        return f"Image is mostly stripes ({hcount}, {vcount})"
+
     def choose_color_function(self, stats, modulo):
         if self.color_override:
             return self.color_override
@@ -157,94 +545,7 @@ class ComputeContext:
         return "gradient"
 
     def create_color_function(self, mode, stats):
-        bw_palette = [(0, 0, 0), (255, 255, 255)] # RGB tuples
-        
-        min_key = stats['min_key']
-        max_key = stats['max_key']
-        most_common = stats['most_common_key']
-        
-        if mode == 'onebit':
-            def onebit(n):
-                return bw_palette[0] if n == most_common else bw_palette[1]
-            return onebit
-            
-        if mode == 'gradient':
-            denom = float(max_key - min_key)
-            if denom == 0: denom = 1.0
-            
-            def gradient(n):
-                mag = (n - min_key) / denom
-                # Clamp or handle weirdness
-                mag = max(0.0, min(1.0, mag))
-                val = int(mag * 255)
-                return (val, val, val)
-            return gradient
-            
-        if mode == 'rgb':
-            denom = float(max_key - min_key)
-            if denom == 0: denom = 1.0
-            
-            # Simple heatmap-like RGB: Blue -> Cyan -> Green -> Yellow -> Red
-            # Or just nice trig functions
-            import math
-            def rgb(n):
-                t = (n - min_key) / denom
-                t = max(0.0, min(1.0, t))
-                
-                # Simple spectral approximation
-                # R: peak at 1.0
-                # G: peak at 0.5
-                # B: peak at 0.0
-                
-                # B = max(0, 1 - 2*t)
-                # G = max(0, 1 - 2*abs(t - 0.5))
-                # R = max(0, 2*t - 1) 
-                # This is a bit dark in middles. 
-                
-                # Let's use a Sine-based palette (Cosine actually for 0..1)
-                # r = 0.5 + 0.5*cos(2*pi* (t + 0.0))
-                # g = 0.5 + 0.5*cos(2*pi* (t + 0.33))
-                # b = 0.5 + 0.5*cos(2*pi* (t + 0.67))
-                
-                # Actually, standard "Turbo" or "Jet" like look is popular.
-                # Let's stick to a procedural sine palette which often looks nice and artistic
-                # R: t
-                # G: sin(pi * t)
-                # B: cos(0.5 * pi * t)
-                
-                r = int(255 * t)
-                g = int(255 * math.sin(math.pi * t))
-                b = int(255 * math.cos(0.5 * math.pi * t))
-                
-                return (r, g, b)
-                return (r, g, b)
-            return rgb
-
-        # Single color gradients
-        # Use a map of name -> (r_scale, g_scale, b_scale)
-        single_colors = {
-            'red': (1.0, 0.0, 0.0),
-            'green': (0.0, 1.0, 0.0),
-            'blue': (0.0, 0.0, 1.0),
-            'cyan': (0.0, 1.0, 1.0),
-            'magenta': (1.0, 0.0, 1.0),
-            'yellow': (1.0, 1.0, 0.0),
-            'orange': (1.0, 0.647, 0.0), # Approximately 255, 165, 0
-            'grey': (1.0, 1.0, 1.0),     # Same as gradient
-            'gray': (1.0, 1.0, 1.0)
-        }
-
-        if mode in single_colors:
-            denom = float(max_key - min_key)
-            if denom == 0: denom = 1.0
-            r_s, g_s, b_s = single_colors[mode]
-            
-            def single_gradient(n):
-                mag = (n - min_key) / denom
-                mag = max(0.0, min(1.0, mag))
-                return (int(mag * 255 * r_s), int(mag * 255 * g_s), int(mag * 255 * b_s))
-            return single_gradient
-
-        return lambda n: (128, 128, 128) # fallback
-
-        return lambda n: (128, 128, 128) # fallback
+        # A Colormap: callable per value like the old closures, plus apply()
+        # for whole arrays. See bitart.colormap for the modes and for
+        # registering new ones.
+        return create_colormap(mode, stats)
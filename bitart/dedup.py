@@ -0,0 +1,105 @@
+import hashlib
+import os
+from .optimize import canonical_form
+from .postfix import Postfix
+
+# Persistent record of every function an image was made from, so a search can
+# skip a candidate an earlier image already used before evaluating it.
+# Functions are identified by their canonical form, so x ^ y and y ^ x are
+# one entry. Each key is stored with its owner, a digest of the (seed,
+# attempt) that produced the image: rerunning that same attempt (say, when
+# a batch resumes after a crash) is not a duplicate of itself.
+#
+# The file is a header followed by fixed-size (key, owner) records, appended
+# as images are accepted; a torn last record from a crash is ignored.
+
+KEY_BYTES = 16
+OWNER_BYTES = 8
+RECORD_BYTES = KEY_BYTES + OWNER_BYTES
+HEADER = b"bitdedup\x02"
+
+def function_key(fn, *context):
+    """Digest of fn's canonical form plus context (e.g. the zoom scale)"""
+    digest = hashlib.blake2b(Postfix.from_tree(canonical_form(fn)).to_bytes(), digest_size=KEY_BYTES)
+    for part in context:
+        digest.update(f"|{part}".encode('utf-8'))
+    return digest.digest()
+
+def owner_key(seed, attempt):
+    """Digest of the search attempt that made an image"""
+    return hashlib.blake2b(f"{seed}|{attempt}".encode('utf-8'), digest_size=OWNER_BYTES).digest()
+
+class DedupIndex:
+    def __init__(self, path=None):
+        self.path = path
+        # key -> owner
+        self.keys = {}
+        self.lookups = 0
+        self.hits = 0
+        self._file = None
+        if path and os.path.exists(path) and os.path.getsize(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < len(HEADER) and HEADER.startswith(data):
+                data = HEADER # the header itself was torn
+            if not data.startswith(HEADER):
+                raise ValueError(f"{path} is not a dedup index of this version")
+            end = len(data) - (len(data) - len(HEADER)) % RECORD_BYTES
+            for i in range(len(HEADER), end, RECORD_BYTES):
+                self.keys.setdefault(data[i:i + KEY_BYTES], data[i + KEY_BYTES:i + RECORD_BYTES])
+
+    def __getstate__(self):
+        # Only the process running the search consults the index; copies
+        # pickled to workers stay empty instead of hauling every key along
+        state = self.__dict__.copy()
+        state['keys'] = {}
+        state['_file'] = None
+        return state
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def is_duplicate(self, key, owner):
+        """True if key belongs to an image made by another attempt than owner.
+        Only looks; record() adds keys."""
+        self.lookups += 1
+        known = self.keys.get(key)
+        if known is None or known == owner:
+            return False
+        self.hits += 1
+        return True
+
+    def record(self, key, owner):
+        """Remember key as used by owner's image; a known key keeps its first owner"""
+        if key in self.keys:
+            return
+        self.keys[key] = owner
+        if self.path:
+            if self._file is None:
+                self._open()
+            self._file.write(key + owner)
+            self._file.flush()
+
+    def _open(self):
+        # Write the header to a new file, or drop a torn last record first,
+        # so appends stay aligned
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size < len(HEADER):
+            with open(self.path, 'wb') as f:
+                f.write(HEADER)
+        elif (size - len(HEADER)) % RECORD_BYTES:
+            with open(self.path, 'r+b') as f:
+                f.truncate(size - (size - len(HEADER)) % RECORD_BYTES)
+        self._file = open(self.path, 'ab')
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
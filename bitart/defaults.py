@@ -0,0 +1,14 @@
+# Settings the CLI needs while building its options. Kept free of imports so
+# that `bitart --help` and the worker's startup don't pay for numpy, PIL and
+# friends before they know they need them.
+
+EXTENT = 512
+MAX_ZOOM = 3
+DEFAULT_ZOOM = 1
+
+# Names of the built-in colour modes, in colormap.py's registration order
+COLOR_MODES = ('onebit', 'gradient', 'rgb', 'red', 'green', 'blue', 'cyan',
+               'magenta', 'yellow', 'orange', 'grey', 'gray')
+
+# zlib effort for saved PNGs, 0 (store) to 9 (smallest)
+PNG_LEVEL = 6
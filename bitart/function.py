@@ -1,5 +1,16 @@
 import operator
 from abc import ABC, abstractmethod
+import numpy as np
+from .ranges import binary_range, dtype_for, unary_range
+
+# Bounds of the fixed-width dtype used by the array evaluator. Anything that
+# could leave this range is evaluated on object arrays (Python ints) instead.
+INT64_MIN = int(np.iinfo(np.int64).min)
+INT64_MAX = int(np.iinfo(np.int64).max)
+
+# Names a Lookup may refer to: the pixel coordinates and the frame number t
+# of an animation (0 for still images)
+VARIABLES = ('x', 'y', 't')
 
 class PlotFnError(RuntimeError):
     pass
@@ -20,6 +31,52 @@ def safe_mod(a, b):
         return 0
     return a % b
 
+def array_safe_div(a, b):
+    # Elementwise safe_div: 0/0 -> 1, n/0 -> -1, floor division otherwise.
+    # Zero divisors are swapped for 1 so numpy never sees them.
+    zero = (b == 0)
+    quot = np.floor_divide(a, np.where(zero, 1, b))
+    return np.where(zero, np.where(a == 0, 1, -1), quot)
+
+def array_safe_mod(a, b):
+    zero = (b == 0)
+    rem = np.mod(a, np.where(zero, 1, b))
+    return np.where(zero, 0, rem)
+
+def context_ranges(context):
+    """(min, max) of every variable's values in an evaluation context"""
+    return {name: (int(np.min(values)), int(np.max(values))) for name, values in context.items()}
+
+def _array_bounds(arr):
+    return int(arr.min()), int(arr.max())
+
+def _fits_int64(lo, hi):
+    return INT64_MIN <= lo and hi <= INT64_MAX
+
+def _result_bounds(op_symbol, lhs, rhs):
+    """(lo, hi) containing every result of an int64 operation given its
+    operands' extremes (the exact extremes for + - * and negation), or None
+    when the result can never leave the operands' range."""
+    if op_symbol in ('&', '|', '^', '%', '~'):
+        return None
+    r_lo, r_hi = _array_bounds(rhs)
+    if op_symbol == '-@':
+        return -r_hi, -r_lo
+    l_lo, l_hi = _array_bounds(lhs)
+    if op_symbol == '+':
+        return l_lo + r_lo, l_hi + r_hi
+    if op_symbol == '-':
+        return l_lo - r_hi, l_hi - r_lo
+    if op_symbol == '*':
+        products = (l_lo * r_lo, l_lo * r_hi, l_hi * r_lo, l_hi * r_hi)
+        return min(products), max(products)
+    if op_symbol == '/':
+        # |a // b| <= |a| for b != 0, and safe_div gives 1 or -1 for b == 0;
+        # only INT64_MIN // -1 escapes int64
+        bound = max(abs(l_lo), abs(l_hi), 1)
+        return -bound, bound
+    raise PlotFnError(f"Unknown operator '{op_symbol}'")
+
 class PlotFn(ABC):
     @property
     def is_lookup(self): return False
@@ -45,6 +102,61 @@ class PlotFn(ABC):
     @abstractmethod
     def __call__(self, context): raise NotImplementedError
 
+    @abstractmethod
+    def evaluate_array(self, context, ranges=None):
+        """Evaluate over whole coordinate arrays at once.
+
+        context maps variable names to integer ndarrays that broadcast against
+        each other. Passing x as a (1, W) row and y as an (H, 1) column keeps
+        every subtree in the shape of the variables it depends on (see
+        variables): constants stay scalars, x-only and y-only subtrees stay
+        1-D, and only nodes combining both become (H, W).
+
+        Each node's result uses the narrowest dtype its value_range proves
+        safe (int32, int64), and object arrays of Python ints only when even
+        int64 could overflow. ranges are the variables' (min, max), worked
+        out from context when not given.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def value_range(self, ranges):
+        """Proven (lo, hi) of this node's values, given each variable's (lo, hi)"""
+        raise NotImplementedError
+
+    @property
+    @abstractmethod
+    def variables(self):
+        """frozenset of the variable names this node depends on; empty for
+        constant subtrees"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def source(self):
+        """Python expression text computing this node from x, y and t."""
+        raise NotImplementedError
+
+    def compile(self):
+        """Flatten the tree into a single generated function f(x, y, t=0).
+
+        Source and function are cached on the node, so later calls (e.g.
+        another zoom level) reuse them.
+        """
+        compiled = getattr(self, '_compiled', None)
+        if compiled is None:
+            self._source = f"def f(x, y, t=0):\n    return {self.source()}\n"
+            namespace = {'safe_div': safe_div, 'safe_mod': safe_mod}
+            exec(compile(self._source, '<plotfn>', 'exec'), namespace)
+            compiled = self._compiled = namespace['f']
+        return compiled
+
+    def __reduce__(self):
+        # Pickled as postfix bytes, a small fraction of the object graph;
+        # cached ranges, simplified forms and generated functions are
+        # rebuilt on demand
+        from .postfix import Postfix, tree_from_bytes
+        return tree_from_bytes, (Postfix.from_tree(self).to_bytes(),)
+
     @classmethod
     def wrap(cls, obj):
         if isinstance(obj, PlotFn):
@@ -72,6 +184,28 @@ class Expression(PlotFn):
         '~': operator.inv,
     }
 
+    ARRAY_BIN_OPS = {
+        '+': np.add,
+        '-': np.subtract,
+        '*': np.multiply,
+        '&': np.bitwise_and,
+        '|': np.bitwise_or,
+        '^': np.bitwise_xor,
+        '/': array_safe_div,
+        '%': array_safe_mod,
+    }
+
+    ARRAY_UN_OPS = {
+        '-@': np.negative,
+        '~': np.invert,
+    }
+
+    # Operators that have no inline Python form compile to helper calls
+    SOURCE_CALLS = {
+        '/': 'safe_div',
+        '%': 'safe_mod',
+    }
+
     def __init__(self, op_symbol, arg1, arg2=None):
         self.op_symbol = op_symbol
         self.binary = arg2 is not None
@@ -82,10 +216,12 @@ class Expression(PlotFn):
             if op_symbol not in self.BIN_OPS:
                 raise PlotFnError(f"Unknown binary operator '{op_symbol}'")
             self.op_func = self.BIN_OPS[op_symbol]
+            self.array_func = self.ARRAY_BIN_OPS[op_symbol]
         else:
             if op_symbol not in self.UN_OPS:
                 raise PlotFnError(f"Unknown unary operator '{op_symbol}'")
             self.op_func = self.UN_OPS[op_symbol]
+            self.array_func = self.ARRAY_UN_OPS[op_symbol]
 
     @property
     def is_binary(self): return self.binary
@@ -96,6 +232,16 @@ class Expression(PlotFn):
     @property
     def is_expression(self): return True
 
+    @property
+    def variables(self):
+        variables = getattr(self, '_variables', None)
+        if variables is None:
+            variables = self.rhs.variables
+            if self.binary:
+                variables = variables | self.lhs.variables
+            self._variables = variables
+        return variables
+
     def __repr__(self):
         args = [f"'{self.op_symbol}'"]
         if self.binary:
@@ -128,12 +274,66 @@ class Expression(PlotFn):
              # Python integers have arbitrary precision so overflow isn't an issue like in C.
              raise
 
+    def evaluate_array(self, context, ranges=None):
+        if ranges is None:
+            ranges = context_ranges(context)
+        rhs = self.rhs.evaluate_array(context, ranges)
+        if not self.binary:
+            return self.apply_array(self.op_symbol, [rhs], self.value_range(ranges))
+        lhs = self.lhs.evaluate_array(context, ranges)
+        return self.apply_array(self.op_symbol, [lhs, rhs], self.value_range(ranges))
+
+    @classmethod
+    def apply_array(cls, op_symbol, operands, value_range):
+        """Apply an operator to evaluated operand arrays (lhs first) whose
+        result is proven to lie in value_range"""
+        # The result is stored in the narrowest dtype its proven range fits,
+        # but the operation runs at least as wide as its operands
+        dtype = dtype_for(*value_range)
+        work = np.result_type(dtype, *(arr.dtype for arr in operands))
+        if work == object and not any(arr.dtype == object for arr in operands):
+            # Static ranges are conservative; the operands' actual extremes
+            # may still keep this operation inside int64
+            lhs, rhs = operands if len(operands) == 2 else (None, operands[0])
+            bounds = _result_bounds(op_symbol, lhs, rhs)
+            if bounds is None or _fits_int64(*bounds):
+                work = np.dtype(np.int64)
+
+        array_func = cls.ARRAY_BIN_OPS[op_symbol] if len(operands) == 2 else cls.ARRAY_UN_OPS[op_symbol]
+        result = np.asarray(array_func(*(arr.astype(work, copy=False) for arr in operands)))
+        if dtype != object and result.dtype != dtype:
+            result = result.astype(dtype)
+        return result
+
+    def value_range(self, ranges):
+        cached = getattr(self, '_range', None)
+        if cached is not None and cached[0] == ranges:
+            return cached[1]
+        if self.binary:
+            result = binary_range(self.op_symbol, self.lhs.value_range(ranges), self.rhs.value_range(ranges))
+        else:
+            result = unary_range(self.op_symbol, self.rhs.value_range(ranges))
+        self._range = (dict(ranges), result)
+        return result
+
+    def source(self):
+        rhs = self.rhs.source()
+        if not self.binary:
+            return f"({self.op_symbol.replace('@', '')}{rhs})"
+        lhs = self.lhs.source()
+        if self.op_symbol in self.SOURCE_CALLS:
+            return f"{self.SOURCE_CALLS[self.op_symbol]}({lhs}, {rhs})"
+        return f"({lhs} {self.op_symbol} {rhs})"
+
 class Literal(PlotFn):
     def __init__(self, value):
         self.value = value
         
     @property
     def is_literal(self): return True
+
+    @property
+    def variables(self): return frozenset()
     
     def __str__(self): return str(self.value)
     
@@ -142,12 +342,24 @@ class Literal(PlotFn):
     def __call__(self, context):
         return self.value
 
+    def evaluate_array(self, context, ranges=None):
+        return np.asarray(self.value, dtype=dtype_for(self.value, self.value))
+
+    def value_range(self, ranges):
+        return self.value, self.value
+
+    def source(self):
+        return f"({self.value!r})"
+
 class Lookup(PlotFn):
     def __init__(self, name):
         self.name = name
         
     @property
     def is_lookup(self): return True
+
+    @property
+    def variables(self): return frozenset([self.name])
     
     def __str__(self): return self.name
     
@@ -155,3 +367,14 @@ class Lookup(PlotFn):
     
     def __call__(self, context):
         return context[self.name]
+
+    def evaluate_array(self, context, ranges=None):
+        values = np.asarray(context[self.name])
+        lo, hi = ranges[self.name] if ranges else (int(values.min()), int(values.max()))
+        return values.astype(dtype_for(lo, hi), copy=False)
+
+    def value_range(self, ranges):
+        return ranges[self.name]
+
+    def source(self):
+        return self.name
@@ -1,71 +1,110 @@
 from collections import Counter
+import numpy as np
 
-class Grid:
-    def __init__(self, width, height):
-        self.width = width
-        self.height = height
-        self.points = [0] * (width * height)
+def _coerce(values, dtype):
+    """Flat array of values in dtype, or object dtype (Python ints) if they don't fit"""
+    if isinstance(values, np.ndarray):
+        values = values.reshape(-1)
+        if values.dtype == dtype or values.dtype == object:
+            return values
+        if np.dtype(dtype) == object:
+            return values.astype(object)
+        info = np.iinfo(dtype)
+        if values.size and (values.min() < info.min or values.max() > info.max):
+            return values.astype(object)
+        return values.astype(dtype)
+    try:
+        return np.asarray(values, dtype=dtype).reshape(-1)
+    except OverflowError:
+        return np.asarray(values, dtype=object).reshape(-1)
 
-    def __getitem__(self, xy):
-        x, y = xy
-        if not (0 <= x < self.width): raise IndexError(f"X out of bounds: {x}")
-        if not (0 <= y < self.height): raise IndexError(f"Y out of bounds: {y}")
-        return self.points[x + (self.width * y)]
+def _periodic_rows(rows, max_pattern_length):
+    """Bulk version of Grid._find_pattern_in: for every row of a 2-D array,
+    whether the pattern search would succeed."""
+    count, length = rows.shape
+    # first_mismatch[p - 1, r]: first n >= p with rows[r, n] != rows[r, n - p],
+    # or length if none. This is where _repeats_to stops for pattern rows[r, :p].
+    first_mismatch = np.full((max_pattern_length, count), length, dtype=np.int64)
+    for period in range(1, min(max_pattern_length, length - 1) + 1):
+        mismatch = rows[:, period:] != rows[:, :-period]
+        hit = mismatch.any(axis=1)
+        first_mismatch[period - 1, hit] = mismatch[hit].argmax(axis=1) + period
 
-    def __setitem__(self, xy, value):
-        x, y = xy
-        # Ruby version throws error, Python list throws IndexError usually, we can strict check if we want
-        # but let's assume valid access or rely on list bounds check + index calc
-        if not (0 <= x < self.width): raise IndexError(f"X out of bounds: {x}")
-        if not (0 <= y < self.height): raise IndexError(f"Y out of bounds: {y}")
-        self.points[x + (self.width * y)] = value
+    # Follow the same chain of growing patterns for all rows at once
+    period = np.ones(count, dtype=np.int64)
+    found = np.zeros(count, dtype=bool)
+    active = np.ones(count, dtype=bool)
+    while True:
+        which = np.flatnonzero(active)
+        if not which.size:
+            break
+        idx = first_mismatch[period[which] - 1, which]
+        done = idx + period[which] > length
+        found[which[done]] = True
+        active[which[done]] = False
 
-    def fill(self, value):
-        self.points = [value] * (self.width * self.height)
+        grown, still = idx[~done] + 1, which[~done]
+        period[still] = grown
+        active[still[grown > max_pattern_length]] = False
+    return found
 
-    def map_inplace(self, func):
-        """func takes (x, y, current_value) and returns new_value"""
-        for y in range(self.height):
-            for x in range(self.width):
-                i = x + (self.width * y)
-                self.points[i] = func(x, y, self.points[i])
+class Histogram:
+    """Sorted distinct values with their counts and first (row-major) index.
+    Histograms of separate pieces of a grid merge into the histogram of the
+    whole, so a grid can be analysed band by band."""
 
-    def each_pos(self):
-        """Yields (x, y, value)"""
-        for y in range(self.height):
-            for x in range(self.width):
-                val = self.points[x + (self.width * y)]
-                yield x, y, val
+    def __init__(self, keys, first_index, counts):
+        self.keys = keys
+        self.first_index = first_index
+        self.counts = counts
 
-    def histogram(self):
-        return Counter(self.points)
+    @classmethod
+    def of(cls, points, offset=0):
+        """Histogram of a flat run of points starting at row-major index offset"""
+        keys, first_index, counts = np.unique(points, return_index=True, return_counts=True)
+        return cls(keys, first_index + offset, counts)
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def merge(self, other):
+        keys = np.concatenate([self.keys, other.keys])
+        merged, inverse = np.unique(keys, return_inverse=True)
+        counts = np.zeros(merged.size, dtype=np.int64)
+        np.add.at(counts, inverse, np.concatenate([self.counts, other.counts]))
+        first_index = np.full(merged.size, np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(first_index, inverse, np.concatenate([self.first_index, other.first_index]))
+        return Histogram(merged, first_index, counts)
 
     def analysis(self):
-        hist = self.histogram()
-        total_pixels = len(self.points)
-        
-        if not hist:
+        keys, first_index, counts = self.keys, self.first_index, self.counts
+        total_pixels = self.total
+
+        if not keys.size:
             return {
                 'num_keys': 0, 'min_key': 0, 'max_key': 0,
                 'most_common_key': 0, 'most_common_key_count': 0,
                 'density': 0.0, 'dominance': 0.0
             }
 
-        keys = list(hist.keys())
-        min_key = min(keys)
-        max_key = max(keys)
-        num_keys = len(keys)
-        
-        # Most common
-        most_common_key, most_common_key_count = hist.most_common(1)[0]
-        
+        # Keys come back sorted
+        min_key = int(keys[0])
+        max_key = int(keys[-1])
+        num_keys = int(keys.size)
+
+        # Most common; ties go to the value seen first, as Counter.most_common did
+        most_common_key_count = int(counts.max())
+        tied = np.flatnonzero(counts == most_common_key_count)
+        most_common_key = int(keys[tied[np.argmin(first_index[tied])]])
+
         # Density: num_keys / (range)
         key_range = (max_key - min_key + 1)
         density = num_keys / float(key_range) if key_range > 0 else 0.0
-        
+
         # Dominance: fraction of pixels containing most common value
         dominance = most_common_key_count / float(total_pixels)
-        
+
         return {
             'num_keys': num_keys,
             'min_key': min_key,
@@ -76,14 +115,89 @@ class Grid:
             'dominance': dominance
         }
 
+class Grid:
+    def __init__(self, width, height, dtype=np.int64):
+        self.width = width
+        self.height = height
+        # Flat row-major storage; object dtype holds values too big for dtype
+        self.points = np.zeros(width * height, dtype=dtype)
+
+    @property
+    def values(self):
+        """2-D (height, width) view of the points; indexed [y, x]"""
+        return self.points.reshape(self.height, self.width)
+
+    def row(self, y):
+        """View (no copy) of row y"""
+        return self.values[y]
+
+    def column(self, x):
+        """Strided view (no copy) of column x"""
+        return self.values[:, x]
+
+    def __getitem__(self, xy):
+        x, y = xy
+        # numpy checks the upper bounds; negative indices would silently wrap
+        if x < 0: raise IndexError(f"X out of bounds: {x}")
+        if y < 0: raise IndexError(f"Y out of bounds: {y}")
+        return self.values.item(y, x)
+
+    def __setitem__(self, xy, value):
+        x, y = xy
+        if x < 0: raise IndexError(f"X out of bounds: {x}")
+        if y < 0: raise IndexError(f"Y out of bounds: {y}")
+        try:
+            self.values[y, x] = value
+        except OverflowError:
+            self.points = self.points.astype(object)
+            self.values[y, x] = value
+
+    def set_points(self, values):
+        """Replace all points with a flat row-major sequence or array"""
+        points = _coerce(values, self.points.dtype)
+        if points.size != self.width * self.height:
+            raise ValueError(f"Expected {self.width * self.height} points, got {points.size}")
+        self.points = points
+
+    def fill(self, value):
+        dtype = _coerce([value], self.points.dtype).dtype
+        self.points = np.full(self.width * self.height, value, dtype=dtype)
+
+    def map_inplace(self, func):
+        """func takes (x, y, current_value) and returns new_value"""
+        self.set_points([func(x, y, val) for x, y, val in self.each_pos()])
+
+    def each_pos(self):
+        """Yields (x, y, value)"""
+        for y, row in enumerate(self.values.tolist()):
+            for x, val in enumerate(row):
+                yield x, y, val
+
+    def key_counts(self):
+        """Sorted distinct values with their first (row-major) index and count"""
+        return np.unique(self.points, return_index=True, return_counts=True)
+
+    def histogram(self):
+        keys, _, counts = self.key_counts()
+        return Counter(dict(zip(keys.tolist(), counts.tolist())))
+
+    def analysis(self):
+        return Histogram.of(self.points).analysis()
+
     def repeated_pattern(self, index, vertical=True, maxlen=8):
         if vertical:
-            stripe = [self[index, y] for y in range(self.height)]
+            stripe = self.column(index).tolist()
         else:
-            stripe = [self[x, index] for x in range(self.width)]
-            
+            stripe = self.row(index).tolist()
+
         return self._find_pattern_in(stripe, maxlen)
 
+    def repeated_patterns(self, vertical=True, maxlen=8):
+        """Bool array telling, for every column (vertical) or row, whether
+        repeated_pattern would find a pattern"""
+        rows = self.values.T if vertical else self.values
+        return _periodic_rows(rows, maxlen)
+
     def _find_pattern_in(self, stripe, max_pattern_length):
         if not stripe: return None
         pattern = [stripe[0]]
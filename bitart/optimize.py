@@ -0,0 +1,159 @@
+from .function import Expression, Literal
+
+# Constant folding and algebraic identities over PlotFn trees. Every rule holds
+# for all Python ints under safe_div/safe_mod, so a simplified tree computes
+# exactly the same image. Trees are never modified in place: the original keeps
+# its text for the metadata.
+
+def count_nodes(fn):
+    if not fn.is_expression:
+        return 1
+    if fn.is_unary:
+        return 1 + count_nodes(fn.rhs)
+    return 1 + count_nodes(fn.lhs) + count_nodes(fn.rhs)
+
+def simplify(fn):
+    """Return (simplified tree, number of nodes removed)"""
+    result = _simplify(fn)
+    return result, count_nodes(fn) - count_nodes(result)
+
+def simplified(fn):
+    """simplify(fn), cached on fn"""
+    cached = getattr(fn, '_simplified', None)
+    if cached is None:
+        cached = fn._simplified = simplify(fn)
+    return cached
+
+def _same(a, b):
+    # Trees are pure functions of x and y, so equal structure means equal values
+    return a is b or repr(a) == repr(b)
+
+def _is_value(fn, value):
+    return fn.is_literal and fn.value == value
+
+def _negate(fn):
+    if fn.is_literal:
+        return Literal(-fn.value)
+    if fn.is_unary and fn.op_symbol == '-@':
+        return fn.rhs
+    return Expression('-@', fn)
+
+def _simplify(fn):
+    if not fn.is_expression:
+        return fn
+
+    rhs = _simplify(fn.rhs)
+    if fn.is_unary:
+        if rhs.is_literal:
+            return Literal(fn.op_func(rhs.value))
+        # ~~e and --e
+        if rhs.is_unary and rhs.op_symbol == fn.op_symbol:
+            return rhs.rhs
+        return fn if rhs is fn.rhs else Expression(fn.op_symbol, rhs)
+
+    lhs = _simplify(fn.lhs)
+    if lhs.is_literal and rhs.is_literal:
+        return Literal(fn.op_func(lhs.value, rhs.value))
+
+    reduced = _binary_identity(fn.op_symbol, lhs, rhs)
+    if reduced is not None:
+        return reduced
+    if lhs is fn.lhs and rhs is fn.rhs:
+        return fn
+    return Expression(fn.op_symbol, lhs, rhs)
+
+def _binary_identity(op, lhs, rhs):
+    """A smaller tree equal to 'lhs op rhs', or None"""
+    same = _same(lhs, rhs)
+
+    if op == '+':
+        if _is_value(lhs, 0): return rhs
+        if _is_value(rhs, 0): return lhs
+    elif op == '-':
+        if same: return Literal(0)
+        if _is_value(rhs, 0): return lhs
+        if _is_value(lhs, 0): return _negate(rhs)
+    elif op == '*':
+        if _is_value(lhs, 0) or _is_value(rhs, 0): return Literal(0)
+        if _is_value(lhs, 1): return rhs
+        if _is_value(rhs, 1): return lhs
+        if _is_value(lhs, -1): return _negate(rhs)
+        if _is_value(rhs, -1): return _negate(lhs)
+    elif op == '&':
+        if same: return lhs
+        if _is_value(lhs, 0) or _is_value(rhs, 0): return Literal(0)
+        if _is_value(lhs, -1): return rhs
+        if _is_value(rhs, -1): return lhs
+    elif op == '|':
+        if same: return lhs
+        if _is_value(lhs, -1) or _is_value(rhs, -1): return Literal(-1)
+        if _is_value(lhs, 0): return rhs
+        if _is_value(rhs, 0): return lhs
+    elif op == '^':
+        if same: return Literal(0)
+        if _is_value(lhs, 0): return rhs
+        if _is_value(rhs, 0): return lhs
+    elif op == '/':
+        # safe_div(a, a) is 1 for a == 0 as well
+        if same: return Literal(1)
+        if _is_value(rhs, 1): return lhs
+        if _is_value(rhs, -1): return _negate(lhs)
+    elif op == '%':
+        # safe_mod(a, a) and safe_mod(0, b) are 0 for zero operands as well
+        if same or _is_value(lhs, 0): return Literal(0)
+        if _is_value(rhs, 0) or _is_value(rhs, 1) or _is_value(rhs, -1): return Literal(0)
+        # (e % m) % m == e % m: the inner result is already reduced (or 0 when m is 0)
+        if lhs.is_binary and lhs.op_symbol == '%' and _same(lhs.rhs, rhs):
+            return lhs
+    return None
+
+# Canonical form: one spelling for trees that differ only in the order or
+# grouping of commutative, associative operators, e.g. x ^ y and y ^ x, or
+# (x + 3) + (y + 4) and (y + x) + 7. Used as a key for caches and dedup, never
+# for evaluation: the operand order is arbitrary, not fast.
+
+ASSOCIATIVE = ('+', '*', '&', '|', '^')
+
+def _operands(fn, op):
+    # Leaves of the maximal chain of op rooted at fn
+    if fn.is_binary and fn.op_symbol == op:
+        return _operands(fn.lhs, op) + _operands(fn.rhs, op)
+    return [fn]
+
+def _order(fn):
+    from .postfix import Postfix
+    return Postfix.from_tree(fn).to_bytes()
+
+def canonical(fn):
+    """Tree equal in value to fn with associative chains flattened, their
+    literals folded together and their operands sorted"""
+    if not fn.is_expression:
+        return fn
+    op = fn.op_symbol
+    if fn.is_unary:
+        return Expression(op, canonical(fn.rhs))
+    if op not in ASSOCIATIVE:
+        return Expression(op, canonical(fn.lhs), canonical(fn.rhs))
+
+    operands = [canonical(leaf) for leaf in _operands(fn, op)]
+    literals = [leaf.value for leaf in operands if leaf.is_literal]
+    operands = [leaf for leaf in operands if not leaf.is_literal]
+    if literals:
+        value = literals[0]
+        for other in literals[1:]:
+            value = Expression.BIN_OPS[op](value, other)
+        operands.append(Literal(value))
+
+    operands.sort(key=_order)
+    result = operands[0]
+    for operand in operands[1:]:
+        reduced = _binary_identity(op, result, operand)
+        result = reduced if reduced is not None else Expression(op, result, operand)
+    return result
+
+def canonical_form(fn):
+    """canonical(simplified(fn)), cached on fn"""
+    cached = getattr(fn, '_canonical', None)
+    if cached is None:
+        cached = fn._canonical = canonical(simplified(fn)[0])
+    return cached
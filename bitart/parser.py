@@ -1,5 +1,5 @@
 import ast
-from .function import Expression, Literal, Lookup
+from .function import VARIABLES, Expression, Literal, Lookup
 
 class EquationParser:
     def parse(self, equation_str):
@@ -63,8 +63,8 @@ class EquationParser:
         return Expression(op_sym, operand)
 
     def _transform_name(self, node):
-        if node.id not in ('x', 'y'):
-            raise ValueError(f"Unknown variable: {node.id}. Only 'x' and 'y' allowed.")
+        if node.id not in VARIABLES:
+            raise ValueError(f"Unknown variable: {node.id}. Only {', '.join(VARIABLES)} allowed.")
         return Lookup(node.id)
 
     def _transform_constant(self, node):
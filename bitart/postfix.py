@@ -0,0 +1,218 @@
+import numpy as np
+from .function import Expression, Literal, Lookup, context_ranges
+from .ranges import binary_range, dtype_for, unary_range
+
+# Flat postfix (RPN) form of a PlotFn: one opcode byte per node, children
+# before parents, with literal values in a side table consumed in order.
+# It hashes and compares as two immutable sequences, evaluates on a stack
+# without recursion, and packs into a few bytes per node for catalogs and
+# for pickling trees to worker processes.
+
+# Opcode numbers are part of the on-disk format: only ever append
+OPCODES = ('x', 'y', 't', '#', '+', '-', '*', '&', '|', '^', '/', '%', '-@', '~')
+OPCODE = {name: code for code, name in enumerate(OPCODES)}
+LITERAL = OPCODE['#']
+FORMAT_VERSION = 1
+
+def _arity(code):
+    name = OPCODES[code]
+    if name in Expression.BIN_OPS:
+        return 2
+    if name in Expression.UN_OPS:
+        return 1
+    return 0
+
+ARITY = bytes(_arity(code) for code in range(len(OPCODES)))
+
+def _write_varint(out, n):
+    # LEB128 of a zigzag-mapped int, so any size or sign fits
+    n = n << 1 if n >= 0 else ((-n) << 1) - 1
+    while True:
+        low = n & 0x7f
+        n >>= 7
+        if n:
+            out.append(low | 0x80)
+        else:
+            out.append(low)
+            return
+
+def _read_varint(data, pos):
+    n = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Truncated postfix data")
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            break
+    return (n >> 1) if not n & 1 else -((n + 1) >> 1), pos
+
+class Postfix:
+    __slots__ = ('code', 'literals', '_hash')
+
+    def __init__(self, code, literals=()):
+        self.code = bytes(code)
+        self.literals = tuple(literals)
+        self._hash = None
+        self._check()
+
+    def _check(self):
+        depth = 0
+        literals = 0
+        for code in self.code:
+            if code >= len(OPCODES):
+                raise ValueError(f"Unknown opcode {code}")
+            arity = ARITY[code]
+            if depth < arity:
+                raise ValueError("Operator without enough operands")
+            depth += 1 - arity
+            literals += code == LITERAL
+        if depth != 1:
+            raise ValueError("Postfix code must leave exactly one value")
+        if literals != len(self.literals):
+            raise ValueError(f"{literals} literal opcodes but {len(self.literals)} literals")
+
+    @classmethod
+    def from_tree(cls, fn):
+        code = bytearray()
+        literals = []
+        # Iterative post-order walk: deep trees must not hit the recursion limit
+        stack = [(fn, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node.is_expression and not expanded:
+                stack.append((node, True))
+                stack.append((node.rhs, False))
+                if node.is_binary:
+                    stack.append((node.lhs, False))
+            elif node.is_expression:
+                code.append(OPCODE[node.op_symbol])
+            elif node.is_literal:
+                code.append(LITERAL)
+                literals.append(node.value)
+            elif node.name in OPCODE:
+                code.append(OPCODE[node.name])
+            else:
+                raise ValueError(f"No opcode for variable '{node.name}'")
+        return cls(code, literals)
+
+    @classmethod
+    def from_equation(cls, text):
+        from .parser import EquationParser
+        return cls.from_tree(EquationParser().parse(text))
+
+    def to_tree(self):
+        stack = []
+        literals = iter(self.literals)
+        for code in self.code:
+            arity = ARITY[code]
+            if arity == 2:
+                rhs = stack.pop()
+                stack.append(Expression(OPCODES[code], stack.pop(), rhs))
+            elif arity == 1:
+                stack.append(Expression(OPCODES[code], stack.pop()))
+            elif code == LITERAL:
+                stack.append(Literal(next(literals)))
+            else:
+                stack.append(Lookup(OPCODES[code]))
+        return stack[0]
+
+    def to_bytes(self):
+        out = bytearray([FORMAT_VERSION])
+        _write_varint(out, len(self.code))
+        out += self.code
+        for value in self.literals:
+            _write_varint(out, value)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if not data or data[0] != FORMAT_VERSION:
+            raise ValueError("Not postfix data, or an unknown format version")
+        length, pos = _read_varint(data, 1)
+        code = data[pos:pos + length]
+        if len(code) != length:
+            raise ValueError("Truncated postfix data")
+        pos += length
+        literals = []
+        for _ in range(code.count(LITERAL)):
+            value, pos = _read_varint(data, pos)
+            literals.append(value)
+        if pos != len(data):
+            raise ValueError("Trailing bytes after postfix data")
+        return cls(code, literals)
+
+    def __eq__(self, other):
+        if not isinstance(other, Postfix):
+            return NotImplemented
+        return self.code == other.code and self.literals == other.literals
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash((self.code, self.literals))
+        return self._hash
+
+    def __len__(self):
+        return len(self.code)
+
+    def __str__(self):
+        return str(self.to_tree())
+
+    def __repr__(self):
+        return f"Postfix({self.code!r}, {self.literals!r})"
+
+    def __reduce__(self):
+        return Postfix.from_bytes, (self.to_bytes(),)
+
+    @property
+    def variables(self):
+        return frozenset(OPCODES[code] for code in set(self.code) if ARITY[code] == 0 and code != LITERAL)
+
+    def value_range(self, ranges):
+        stack = []
+        literals = iter(self.literals)
+        for code in self.code:
+            arity = ARITY[code]
+            if arity == 2:
+                rhs = stack.pop()
+                stack.append(binary_range(OPCODES[code], stack.pop(), rhs))
+            elif arity == 1:
+                stack.append(unary_range(OPCODES[code], stack.pop()))
+            elif code == LITERAL:
+                value = next(literals)
+                stack.append((value, value))
+            else:
+                stack.append(ranges[OPCODES[code]])
+        return stack[0]
+
+    def evaluate_array(self, context, ranges=None):
+        """Same values (and dtypes) as the tree's evaluate_array, on a stack
+        of (array, range) pairs instead of a recursive walk"""
+        if ranges is None:
+            ranges = context_ranges(context)
+        stack = []
+        literals = iter(self.literals)
+        for code in self.code:
+            arity = ARITY[code]
+            if arity == 2:
+                rhs, rhs_range = stack.pop()
+                lhs, lhs_range = stack.pop()
+                value_range = binary_range(OPCODES[code], lhs_range, rhs_range)
+                stack.append((Expression.apply_array(OPCODES[code], [lhs, rhs], value_range), value_range))
+            elif arity == 1:
+                arg, arg_range = stack.pop()
+                value_range = unary_range(OPCODES[code], arg_range)
+                stack.append((Expression.apply_array(OPCODES[code], [arg], value_range), value_range))
+            elif code == LITERAL:
+                value = next(literals)
+                stack.append((np.asarray(value, dtype=dtype_for(value, value)), (value, value)))
+            else:
+                name = OPCODES[code]
+                lo, hi = ranges[name]
+                stack.append((np.asarray(context[name]).astype(dtype_for(lo, hi), copy=False), (lo, hi)))
+        return stack[0][0]
+
+def tree_from_bytes(data):
+    return Postfix.from_bytes(data).to_tree()
@@ -0,0 +1,88 @@
+# Known-bits analysis: which of the low KNOWN_BITS bits of a node's values are
+# the same for every pixel. Together with the value ranges this proves some
+# trees constant that interval arithmetic alone can't, e.g. (x & 16) % 8,
+# where the only bit x contributes is masked away by the modulus.
+
+KNOWN_BITS = 64
+FULL = (1 << KNOWN_BITS) - 1
+
+def _low(n):
+    return (1 << min(n, KNOWN_BITS)) - 1
+
+def _trailing(mask):
+    # Length of the run of set bits at the bottom of mask
+    return ((mask + 1) & ~mask).bit_length() - 1
+
+def _from_range(lo, hi):
+    """(mask, value) of the bits fixed by the range alone"""
+    if lo == hi:
+        return FULL, lo & FULL
+    if lo >= 0:
+        n, ones = hi.bit_length(), False
+    elif hi < 0:
+        n, ones = (-lo - 1).bit_length(), True
+    else:
+        return 0, 0
+    mask = FULL & ~_low(n)
+    return mask, mask if ones else 0
+
+def _merge(a, b):
+    (ma, va), (mb, vb) = a, b
+    return ma | mb, (va & ma) | (vb & mb & ~ma)
+
+def known_bits(fn, ranges):
+    """(mask, value): the bits set in mask are known, with value's bits"""
+    bits = _from_range(*fn.value_range(ranges))
+    if not fn.is_expression:
+        return bits
+
+    op = fn.op_symbol
+    ma, va = known_bits(fn.rhs, ranges)
+    if fn.is_unary:
+        if op == '~':
+            derived = ma, ~va & ma
+        else:
+            # -a == ~a + 1: bits are known up to the first unknown one
+            low = _low(_trailing(ma))
+            derived = low, -va & low
+        return _merge(bits, derived)
+
+    (ma, va), (mb, vb) = known_bits(fn.lhs, ranges), (ma, va)
+    ones_a, zeros_a = ma & va, ma & ~va
+    ones_b, zeros_b = mb & vb, mb & ~vb
+
+    derived = (0, 0)
+    if op == '&':
+        ones, zeros = ones_a & ones_b, zeros_a | zeros_b
+        derived = ones | zeros, ones
+    elif op == '|':
+        ones, zeros = ones_a | ones_b, zeros_a & zeros_b
+        derived = ones | zeros, ones
+    elif op == '^':
+        mask = ma & mb
+        derived = mask, (va ^ vb) & mask
+    elif op in ('+', '-'):
+        # Carries and borrows only travel upwards
+        low = _low(min(_trailing(ma), _trailing(mb)))
+        derived = low, (va + vb if op == '+' else va - vb) & low
+    elif op == '*':
+        low = _low(min(_trailing(ma), _trailing(mb)))
+        zeros = _low(_trailing(zeros_a) + _trailing(zeros_b))
+        derived = low | zeros, (va * vb) & low
+    elif fn.rhs.is_literal and fn.rhs.value > 0 and fn.rhs.value & (fn.rhs.value - 1) == 0:
+        # Power-of-two divisor: % keeps the low bits, / shifts them down
+        k = fn.rhs.value.bit_length() - 1
+        if op == '%':
+            derived = (ma & _low(k)) | (FULL & ~_low(k)), va & ma & _low(k)
+        elif op == '/':
+            derived = ma >> k, (va & ma) >> k
+    return _merge(bits, derived)
+
+def is_constant(fn, ranges):
+    """True when fn provably takes a single value over the variable ranges"""
+    lo, hi = fn.value_range(ranges)
+    if lo == hi:
+        return True
+    # All low bits known and the range too short to hold two values that agree on them
+    mask, _ = known_bits(fn, ranges)
+    return mask == FULL and hi - lo < (1 << KNOWN_BITS)
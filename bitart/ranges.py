@@ -0,0 +1,98 @@
+import numpy as np
+
+# Interval arithmetic over the PlotFn operators. Every rule gives a (lo, hi)
+# that provably contains all results for operands in the given intervals,
+# using the exact safe_div/safe_mod semantics, so evaluation can pick a
+# fixed-width dtype for a subtree knowing it cannot overflow.
+
+# Candidate fixed-width dtypes, narrowest first
+INT_DTYPES = (np.dtype(np.int32), np.dtype(np.int64))
+
+def dtype_for(lo, hi):
+    """Narrowest of INT_DTYPES holding [lo, hi], else object (Python ints)"""
+    for dtype in INT_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return dtype
+    return np.dtype(object)
+
+def _bits(lo, hi):
+    # Smallest n with [lo, hi] inside [-2**n, 2**n - 1]
+    return max((-lo - 1).bit_length() if lo < 0 else 0, hi.bit_length() if hi > 0 else 0)
+
+def unary_range(op_symbol, a):
+    lo, hi = a
+    if op_symbol == '-@':
+        return -hi, -lo
+    if op_symbol == '~':
+        return -hi - 1, -lo - 1
+    raise ValueError(f"Unknown unary operator '{op_symbol}'")
+
+def binary_range(op_symbol, a, b):
+    a_lo, a_hi = a
+    b_lo, b_hi = b
+
+    if op_symbol == '+':
+        return a_lo + b_lo, a_hi + b_hi
+    if op_symbol == '-':
+        return a_lo - b_hi, a_hi - b_lo
+    if op_symbol == '*':
+        products = (a_lo * b_lo, a_lo * b_hi, a_hi * b_lo, a_hi * b_hi)
+        return min(products), max(products)
+
+    if op_symbol in ('&', '|', '^'):
+        # Bitwise results never need more bits than the widest operand
+        n = max(_bits(a_lo, a_hi), _bits(b_lo, b_hi))
+        lo, hi = -(1 << n), (1 << n) - 1
+        if op_symbol == '&':
+            # A non-negative operand masks the result into [0, operand]
+            if a_lo >= 0 and b_lo >= 0:
+                return 0, min(a_hi, b_hi)
+            if a_lo >= 0:
+                return 0, a_hi
+            if b_lo >= 0:
+                return 0, b_hi
+            return lo, max(a_hi, b_hi)
+        if op_symbol == '|':
+            # a | b >= min(a, b), and is negative as soon as one operand is
+            if a_lo >= 0 and b_lo >= 0:
+                return max(a_lo, b_lo), hi
+            if a_hi < 0 or b_hi < 0:
+                return min(a_lo, b_lo), -1
+            return min(a_lo, b_lo), hi
+        if (a_lo >= 0 and b_lo >= 0) or (a_hi < 0 and b_hi < 0):
+            return 0, hi
+        return lo, hi
+
+    if op_symbol == '/':
+        results = []
+        if b_lo <= 0 <= b_hi:
+            # safe_div: 0/0 -> 1, n/0 -> -1
+            if a_lo <= 0 <= a_hi:
+                results.append(1)
+            if a_lo != 0 or a_hi != 0:
+                results.append(-1)
+        # Floor division is monotone in each operand while the divisor keeps
+        # its sign, so the extremes sit at the corners of each sign's part
+        for d_lo, d_hi in ((b_lo, min(b_hi, -1)), (max(b_lo, 1), b_hi)):
+            if d_lo <= d_hi:
+                results.extend(n // d for n in (a_lo, a_hi) for d in (d_lo, d_hi))
+        return min(results), max(results)
+
+    if op_symbol == '%':
+        lows, highs = [], []
+        if b_lo <= 0 <= b_hi:
+            # safe_mod: n % 0 -> 0
+            lows.append(0)
+            highs.append(0)
+        if b_hi >= 1:
+            # Positive divisor: result in [0, divisor - 1], and a itself if a is already smaller
+            lows.append(0)
+            highs.append(min(b_hi - 1, a_hi) if a_lo >= 0 else b_hi - 1)
+        if b_lo <= -1:
+            # Negative divisor: result in [divisor + 1, 0]
+            lows.append(max(b_lo + 1, a_lo) if a_hi <= 0 else b_lo + 1)
+            highs.append(0)
+        return min(lows), max(highs)
+
+    raise ValueError(f"Unknown binary operator '{op_symbol}'")
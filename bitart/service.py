@@ -0,0 +1,162 @@
+import asyncio
+import io
+import json
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+from .colormap import colormap_names
+from .compute import ComputeContext, save_png
+from .defaults import DEFAULT_ZOOM, MAX_ZOOM
+from .parser import EquationParser
+
+# Long-running render server for front ends that would otherwise start a
+# process per image. Renders run on a process pool; identical requests that
+# arrive while one is being computed wait for that one instead of starting
+# their own, and finished PNGs are kept in an LRU so repeats cost nothing.
+
+DEFAULT_CACHE_ITEMS = 256
+# Distinct renders queued or running before new ones are turned away
+DEFAULT_MAX_PENDING = 32
+
+class ServiceBusy(Exception):
+    pass
+
+def render_png(equation, zoom, color):
+    """PNG bytes of one equation; runs in a worker process"""
+    fn = EquationParser().parse(equation)
+    # Concurrent requests already keep every worker process busy
+    cc = ComputeContext(depth=0, scale_power=zoom, color_override=color, threads=1)
+    image = cc.render_custom(fn)[0]
+    out = io.BytesIO()
+    save_png(image, out)
+    return out.getvalue()
+
+class RenderService:
+    def __init__(self, workers=1, cache_items=DEFAULT_CACHE_ITEMS, max_pending=DEFAULT_MAX_PENDING, executor=None):
+        self.workers = workers
+        self.executor = executor or ProcessPoolExecutor(max_workers=workers)
+        self.cache_items = cache_items
+        self.max_pending = max_pending
+        self.cache = OrderedDict()
+        # key -> Future of the render in progress, shared by all its requests
+        self.inflight = {}
+        self.counters = Counter()
+
+    def request_key(self, equation, zoom=DEFAULT_ZOOM, color=None):
+        """Normalised (equation, zoom, color); raises ValueError if invalid"""
+        if color is not None and color not in colormap_names():
+            raise ValueError(f"Unknown colour mode '{color}'")
+        if not 0 <= zoom <= MAX_ZOOM:
+            raise ValueError(f"Zoom must be between 0 and {MAX_ZOOM}")
+        # Parsed and printed back, so spacing and redundant parentheses don't matter
+        return str(EquationParser().parse(equation)), zoom, color
+
+    async def render(self, equation, zoom=DEFAULT_ZOOM, color=None):
+        """PNG bytes; raises ValueError for bad requests, ServiceBusy when full"""
+        key = self.request_key(equation, zoom, color)
+        self.counters['requests'] += 1
+
+        png = self.cache.get(key)
+        if png is not None:
+            self.cache.move_to_end(key)
+            self.counters['cache_hits'] += 1
+            return png
+
+        future = self.inflight.get(key)
+        if future is not None:
+            self.counters['coalesced'] += 1
+            return await asyncio.shield(future)
+
+        if len(self.inflight) >= self.max_pending:
+            self.counters['rejected'] += 1
+            raise ServiceBusy(f"{len(self.inflight)} renders pending")
+
+        self.counters['computed'] += 1
+        loop = asyncio.get_running_loop()
+        future = self.inflight[key] = loop.run_in_executor(self.executor, render_png, *key)
+        # Cached on completion even if every requester has given up by then
+        future.add_done_callback(partial(self._finished, key))
+        # shield: one impatient client must not cancel everyone's render
+        return await asyncio.shield(future)
+
+    def _finished(self, key, future):
+        del self.inflight[key]
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.counters['errors'] += 1
+            return
+        self.cache[key] = future.result()
+        while len(self.cache) > self.cache_items:
+            self.cache.popitem(last=False)
+
+    def metrics(self):
+        return dict(self.counters,
+                    pending=len(self.inflight),
+                    queued=max(len(self.inflight) - self.workers, 0),
+                    max_pending=self.max_pending,
+                    cached=len(self.cache),
+                    cached_bytes=sum(len(png) for png in self.cache.values()))
+
+    async def handle(self, reader, writer):
+        """One HTTP/1.0-style exchange: GET /render?equation=..&zoom=..&color=..
+        or GET /metrics, answered and closed"""
+        try:
+            request = await reader.readline()
+            while (await reader.readline()).strip():
+                pass # headers are not needed
+            status, kind, body = await self.respond(request.decode('latin-1').split())
+        except Exception as err:
+            status, kind, body = 500, 'text/plain', str(err).encode('utf-8')
+
+        reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                   500: 'Internal Server Error', 503: 'Service Unavailable'}
+        head = [f"HTTP/1.1 {status} {reasons[status]}", f"Content-Type: {kind}",
+                f"Content-Length: {len(body)}", "Connection: close"]
+        if status == 503:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def respond(self, request_line):
+        if len(request_line) < 2:
+            return 400, 'text/plain', b"Malformed request"
+        method, target = request_line[:2]
+        if method != 'GET':
+            return 405, 'text/plain', b"Only GET is supported"
+
+        url = urlsplit(target)
+        if url.path == '/metrics':
+            return 200, 'application/json', json.dumps(self.metrics()).encode('utf-8')
+        if url.path != '/render':
+            return 404, 'text/plain', b"Try /render?equation=... or /metrics"
+
+        query = parse_qs(url.query)
+        try:
+            equation = query['equation'][0]
+            zoom = int(query.get('zoom', [DEFAULT_ZOOM])[0])
+            color = query.get('color', [None])[0]
+            png = await self.render(equation, zoom, color)
+        except ServiceBusy as err:
+            return 503, 'text/plain', str(err).encode('utf-8')
+        except (KeyError, ValueError, SyntaxError) as err:
+            return 400, 'text/plain', f"Bad request: {err}".encode('utf-8')
+        return 200, 'image/png', png
+
+    async def start(self, host='127.0.0.1', port=8000, path=None):
+        """Start listening on a TCP port, or a Unix socket when path is given"""
+        if path:
+            return await asyncio.start_unix_server(self.handle, path=path)
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def serve(self, host='127.0.0.1', port=8000, path=None):
+        server = await self.start(host, port, path)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
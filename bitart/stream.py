@@ -0,0 +1,277 @@
+import struct
+import zlib
+import numpy as np
+from .colormap import PALETTE_SIZE
+from .grid import Histogram
+
+# Poster-size rendering: the function is evaluated a band of rows at a time
+# and each band's scanlines go straight into the PNG, so peak memory depends
+# on the band size, never on the image size. Colormaps need min_key/max_key
+# (and onebit the most common value) before the first pixel is coloured, so
+# a first streaming pass gathers the statistics and a second one renders.
+
+DEFAULT_BAND_ROWS = 256
+# Distinct values tracked by the statistics pass before it gives up on the
+# histogram and keeps only min/max, which is all gradient colormaps need
+DEFAULT_MAX_KEYS = 1 << 20
+
+class PNGWriter:
+    """Minimal incremental PNG encoder: rows go in as they are produced and
+    compressed IDAT chunks come out as zlib fills them. mode is one of PIL's
+    '1' (1-bit grey), 'L' (8-bit grey), 'P' (indices into palette, an (n, 3)
+    uint8 array; 1, 2 or 4 bits each when it is that short) or 'RGB'."""
+
+    SIGNATURE = b'\x89PNG\r\n\x1a\n'
+    CHUNK_BYTES = 1 << 16
+    # mode -> (bit depth, colour type)
+    FORMATS = {'1': (1, 0), 'L': (8, 0), 'P': (8, 3), 'RGB': (8, 2)}
+    PALETTE_DEPTHS = (1, 2, 4, 8)
+
+    def __init__(self, f, width, height, level=6, mode='RGB', palette=None):
+        if mode not in self.FORMATS:
+            raise ValueError(f"Unsupported mode {mode!r}")
+        self.f = f
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.rows_written = 0
+        self.level = level
+        self.compressor = zlib.compressobj(level)
+        self.pending = []
+        self.pending_bytes = 0
+        # Last scanline written, which the Up filter subtracts; None before
+        # the first row, where the PNG spec's prior row is all zeros
+        self.previous = None
+
+        self.depth, colour_type = self.FORMATS[mode]
+        if mode == 'P':
+            if palette is None or not 0 < len(palette) <= PALETTE_SIZE:
+                raise ValueError("Mode 'P' needs a palette of 1 to 256 colours")
+            self.depth = next(depth for depth in self.PALETTE_DEPTHS if len(palette) <= 1 << depth)
+        f.write(self.SIGNATURE)
+        # Default compression/filter method, no interlace
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, self.depth, colour_type, 0, 0, 0))
+        if mode == 'P':
+            self._chunk(b'PLTE', np.ascontiguousarray(palette, dtype=np.uint8).tobytes())
+
+    def _chunk(self, kind, data):
+        self.f.write(struct.pack('>I', len(data)))
+        self.f.write(kind)
+        self.f.write(data)
+        self.f.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind)) & 0xffffffff))
+
+    def _emit(self, data, force=False):
+        if data:
+            self.pending.append(data)
+            self.pending_bytes += len(data)
+        if self.pending and (force or self.pending_bytes >= self.CHUNK_BYTES):
+            self._data(b''.join(self.pending))
+            self.pending = []
+            self.pending_bytes = 0
+
+    def _data(self, data):
+        self._chunk(b'IDAT', data)
+
+    def _pack(self, rows):
+        # Scanline bytes; below 8 bits, pixels are packed most significant first
+        if self.mode == '1':
+            return np.packbits(rows > 0, axis=1)
+        if self.depth == 8:
+            return np.ascontiguousarray(rows, dtype=np.uint8).reshape(rows.shape[0], -1)
+        per_byte = 8 // self.depth
+        padded = np.zeros((rows.shape[0], -(-self.width // per_byte) * per_byte), dtype=np.uint8)
+        padded[:, :self.width] = rows
+        shifts = np.arange(8 - self.depth, -1, -self.depth, dtype=np.uint8)
+        return np.bitwise_or.reduce(padded.reshape(rows.shape[0], -1, per_byte) << shifts, axis=2)
+
+    def _filter(self, raw):
+        lines = np.empty((raw.shape[0], 1 + raw.shape[1]), dtype=np.uint8)
+        if self.depth < 8 or self.mode == 'RGB':
+            # Filter 0 for packed pixels, as libpng does, and for RGB: its
+            # colours cycle through hues as values grow, and differencing
+            # them made posters half again as large and slower to compress
+            lines[:, 0] = 0
+            lines[:, 1:] = raw
+            return lines
+
+        # Grey levels and palette indices follow the values, so each scanline
+        # is stored as its difference from the pixel to the left (Sub, 1) or
+        # the row above (Up, 2), whichever has the smaller sum of absolute
+        # differences, as libpng's heuristic does. Smooth gradients and
+        # repeated rows (every zoomed row is) become small numbers or zeros.
+        prior = np.empty_like(raw)
+        prior[0] = 0 if self.previous is None else self.previous
+        prior[1:] = raw[:-1]
+        up = raw - prior
+        sub = raw.copy()
+        sub[:, 1:] -= raw[:, :-1]
+        cost = lambda lines: np.abs(lines.view(np.int8).astype(np.int16)).sum(axis=1)
+        use_sub = cost(sub) <= cost(up)
+
+        lines[:, 0] = np.where(use_sub, 1, 2)
+        lines[:, 1:] = np.where(use_sub[:, None], sub, up)
+        self.previous = raw[-1]
+        return lines
+
+    def write_rows(self, rows):
+        """Append rows from a (rows, width, 3) uint8 array in mode 'RGB', else
+        a (rows, width) one: grey levels, 0 or 255 for '1', or palette indices"""
+        shape = (self.width, 3) if self.mode == 'RGB' else (self.width,)
+        if rows.shape[1:] != shape:
+            raise ValueError(f"Expected rows of shape {shape}, got {rows.shape[1:]}")
+        if self.rows_written + rows.shape[0] > self.height:
+            raise ValueError("More rows than the image height")
+        self._emit(self.compressor.compress(self._filter(self._pack(rows)).tobytes()))
+        self.rows_written += rows.shape[0]
+
+    def close(self):
+        if self.rows_written != self.height:
+            raise ValueError(f"Image has {self.height} rows, only {self.rows_written} written")
+        self._emit(self.compressor.flush(), force=True)
+        self._chunk(b'IEND', b'')
+
+class APNGWriter(PNGWriter):
+    """Animated PNG of a known number of full-size frames. Each frame is
+    written with write_rows like a still image and ended with end_frame(), so
+    only the frame being compressed is ever held in memory."""
+
+    def __init__(self, f, width, height, frames, delay_ms=40, level=6, loops=0, mode='RGB', palette=None):
+        super().__init__(f, width, height, level=level, mode=mode, palette=palette)
+        self.frames = frames
+        self.delay_ms = delay_ms
+        self.frames_written = 0
+        # fcTL and fdAT chunks share one running sequence number
+        self.sequence = 0
+        self._chunk(b'acTL', struct.pack('>II', frames, loops))
+
+    def _next_sequence(self):
+        self.sequence += 1
+        return self.sequence - 1
+
+    def _data(self, data):
+        # The first frame doubles as the still image older viewers show
+        if self.frames_written == 0:
+            self._chunk(b'IDAT', data)
+        else:
+            self._chunk(b'fdAT', struct.pack('>I', self._next_sequence()) + data)
+
+    def write_rows(self, rows):
+        if self.frames_written >= self.frames:
+            raise ValueError("More frames than announced")
+        if self.rows_written == 0:
+            # Full-frame region at (0, 0), no disposal, no blending
+            self._chunk(b'fcTL', struct.pack('>IIIIIHHBB', self._next_sequence(), self.width, self.height,
+                                             0, 0, self.delay_ms, 1000, 0, 0))
+        super().write_rows(rows)
+
+    def end_frame(self):
+        if self.rows_written != self.height:
+            raise ValueError(f"Frame has {self.height} rows, only {self.rows_written} written")
+        self._emit(self.compressor.flush(), force=True)
+        self.compressor = zlib.compressobj(self.level)
+        # Each frame's data is filtered as an image of its own
+        self.previous = None
+        self.rows_written = 0
+        self.frames_written += 1
+
+    def close(self):
+        if self.frames_written != self.frames:
+            raise ValueError(f"Animation has {self.frames} frames, only {self.frames_written} written")
+        self._chunk(b'IEND', b'')
+
+def gather_statistics(pieces, max_keys=DEFAULT_MAX_KEYS):
+    """Grid.analysis-style stats of the (offset, points) pieces of a larger
+    grid, offset being each piece's first row-major index. When more than
+    max_keys distinct values turn up only min_key/max_key stay exact and the
+    histogram-derived fields are None."""
+    histogram = None
+    min_key = max_key = None
+    for offset, points in pieces:
+        lo, hi = int(points.min()), int(points.max())
+        min_key = lo if min_key is None else min(min_key, lo)
+        max_key = hi if max_key is None else max(max_key, hi)
+        if histogram is not False:
+            piece = Histogram.of(points, offset=offset)
+            histogram = piece if histogram is None else histogram.merge(piece)
+            if histogram.keys.size > max_keys:
+                histogram = False # too many values to count in bounded memory
+
+    if histogram:
+        return histogram.analysis()
+    return {
+        'num_keys': None, 'min_key': min_key, 'max_key': max_key,
+        'most_common_key': None, 'most_common_key_count': None,
+        'density': None, 'dominance': None
+    }
+
+def stream_colormap(cc, mode, stats, max_keys=DEFAULT_MAX_KEYS):
+    """cc's colormap for stats that may come from gather_statistics"""
+    if stats['most_common_key'] is None and mode == 'onebit':
+        raise ValueError("Too many distinct values to find the most common one; "
+                         "use a gradient colour mode")
+    if stats['num_keys'] is None:
+        # Unknown, but certainly too many for a lookup table
+        stats = dict(stats, num_keys=max_keys + 1)
+    return cc.create_color_function(mode, stats)
+
+def stream_encoding(colormap):
+    """(mode, palette) for a PNGWriter of colormap's colours. Bands are
+    coloured one at a time, so unlike Colormap.image_array the palette must
+    be known before the first: there is one when the values span at most
+    PALETTE_SIZE integers, indexed by value - min_key. Being in value order,
+    those indices filter better than grey levels or RGB do."""
+    if colormap.image_mode == '1':
+        return '1', None
+    if colormap.max_key - colormap.min_key < PALETTE_SIZE:
+        return 'P', colormap.apply(np.array(range(colormap.min_key, colormap.max_key + 1)))
+    return colormap.image_mode, None
+
+def stream_rows(colormap, mode, values, scale=1):
+    """values as PNGWriter rows in mode, each drawn as a scale x scale block"""
+    if mode == 'P':
+        rows = (values - colormap.min_key).astype(np.uint8)
+    elif mode == 'RGB':
+        rows = colormap.apply(values)
+    else:
+        rows = colormap.image_array(values)[0]
+    if scale > 1:
+        rows = rows.repeat(scale, axis=0).repeat(scale, axis=1)
+    return rows
+
+class StreamRenderer:
+    """Renders fn over an extent x extent lattice, each value drawn as a
+    cc.scale x cc.scale block, band by band. cc supplies the evaluation
+    settings (engine, optimize) and the colormaps."""
+
+    def __init__(self, cc, extent, band_rows=DEFAULT_BAND_ROWS, max_keys=DEFAULT_MAX_KEYS):
+        self.cc = cc
+        self.extent = extent
+        self.band_rows = band_rows
+        self.max_keys = max_keys
+
+    def bands(self, fn):
+        """Yield (first_row, Grid) for consecutive bands of rows"""
+        xs = np.arange(self.extent, dtype=np.int64)
+        for start in range(0, self.extent, self.band_rows):
+            ys = np.arange(start, min(start + self.band_rows, self.extent), dtype=np.int64)
+            yield start, self.cc.evaluate(fn, xs, ys)
+
+    def statistics(self, fn):
+        """Grid.analysis-style stats gathered band by band; see gather_statistics"""
+        pieces = ((start * self.extent, band.points) for start, band in self.bands(fn))
+        return gather_statistics(pieces, self.max_keys)
+
+    def render(self, fn, mode, f, stats=None, level=6):
+        """Write fn as a PNG to the binary file f; returns the stats used"""
+        if stats is None:
+            stats = self.statistics(fn)
+        colormap = stream_colormap(self.cc, mode, stats, self.max_keys)
+
+        image_mode, palette = stream_encoding(colormap)
+
+        size = self.extent * self.cc.scale
+        writer = PNGWriter(f, size, size, level=level, mode=image_mode, palette=palette)
+        for _, band in self.bands(fn):
+            writer.write_rows(stream_rows(colormap, image_mode, band.values, self.cc.scale))
+        writer.close()
+        return stats
@@ -0,0 +1,79 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Wall and CPU time per named stage. ComputeContext and the CLI wrap their
+# stages in tracer.stage(name); by default that is NULL_TRACER, whose stage()
+# hands back one shared do-nothing context manager, so untraced runs pay no
+# more than entering an empty with-block.
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class NullTracer:
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name, **args):
+        return self._stage
+
+    def merge(self, events):
+        pass
+
+NULL_TRACER = NullTracer()
+
+class Tracer:
+    """Records one event per stage run: (name, start, wall, cpu, pid, tid, args),
+    times in seconds with start on the perf_counter clock"""
+    enabled = True
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events = []
+
+    @contextmanager
+    def stage(self, name, **args):
+        start, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield self
+        finally:
+            self.events.append((name, start, time.perf_counter() - start, time.process_time() - cpu,
+                                os.getpid(), threading.get_ident(), args))
+
+    def merge(self, events):
+        """Add events recorded elsewhere, e.g. by a worker process's tracer"""
+        self.events.extend(events)
+
+    def summary(self):
+        """stage -> {'calls', 'wall_s', 'cpu_s'}; nested stages count in their parents too"""
+        totals = {}
+        for name, _, wall, cpu, _, _, _ in self.events:
+            total = totals.setdefault(name, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0})
+            total['calls'] += 1
+            total['wall_s'] += wall
+            total['cpu_s'] += cpu
+        for total in totals.values():
+            total['wall_s'] = round(total['wall_s'], 6)
+            total['cpu_s'] = round(total['cpu_s'], 6)
+        return totals
+
+    def chrome_trace(self):
+        """Trace-event JSON object for chrome://tracing or Perfetto"""
+        # perf_counter is the system-wide monotonic clock on Linux and macOS,
+        # so worker processes' events line up with ours
+        events = [{
+            'name': name, 'ph': 'X', 'cat': 'bitart',
+            'ts': round((start - self.origin) * 1e6, 3), 'dur': round(wall * 1e6, 3),
+            'pid': pid, 'tid': tid, 'args': dict(args, cpu_ms=round(cpu * 1e3, 3)),
+        } for name, start, wall, cpu, pid, tid, args in self.events]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
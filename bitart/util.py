@@ -1,5 +1,5 @@
 import base64
-import yaml
+import hashlib
 
 def crunch64(s):
     if isinstance(s, str):
@@ -10,5 +10,15 @@ def crunch64(s):
     encoded = base64.urlsafe_b64encode(s).decode('ascii')
     return encoded.rstrip('=')
 
+def uncrunch64(s):
+    """Bytes back from crunch64 text"""
+    return base64.urlsafe_b64decode(s + '=' * (-len(s) % 4))
+
 def safe_yaml_dump(obj):
+    import yaml
     return yaml.dump(obj, default_flow_style=False)
+
+def derive_seed(*parts):
+    """64-bit seed derived from parts; stable across runs, machines and Python versions"""
+    digest = hashlib.sha256(':'.join(str(p) for p in parts).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
@@ -0,0 +1,79 @@
+import json
+import time
+
+# Persistent job runner: one process reads JSON-lines jobs and answers each
+# with a JSON-lines result, so a pipeline of thousands of small renders pays
+# interpreter startup and imports once instead of per image.
+#
+# A job is an object with "output" (PNG path) and either "equation" or
+# "depth", plus optional "zoom", "color", "seed", "keep", "png_level",
+# "fast_png", "metadata" (write the .yaml next to the image, default true)
+# and "id" (echoed back).
+
+def run_job(job):
+    """Render one job; returns its result object. Raises on bad jobs."""
+    import re
+    import yaml
+    from .cli import make_metadata
+    from .compute import ComputeContext, save_png
+    from .defaults import DEFAULT_ZOOM, PNG_LEVEL
+    from .parser import EquationParser
+    from .trace import Tracer
+
+    output = job['output']
+    zoom = job.get('zoom', DEFAULT_ZOOM)
+    tracer = Tracer()
+    cc = ComputeContext(depth=job.get('depth', 4), scale_power=zoom, color_override=job.get('color'),
+                        reject_bad=not job.get('keep', False), seed=job.get('seed'), tracer=tracer)
+
+    if 'equation' in job:
+        with tracer.stage('parse'):
+            fn = EquationParser().parse(job['equation'])
+        image, fn, stats, mode, modulo, problem = cc.render_custom(fn)
+    else:
+        image, fn, stats, mode, modulo, problem = cc.compute_and_render()
+        if image is None:
+            return {'ok': False, 'error': problem, 'timings': tracer.summary()}
+
+    with tracer.stage('save'):
+        save_png(image, output, level=job.get('png_level', PNG_LEVEL), fast=job.get('fast_png', False))
+    if job.get('metadata', True):
+        with tracer.stage('metadata'):
+            md = make_metadata(fn, stats, mode, modulo, cc.depth, problem, zoom,
+                               seed=cc.last_seed, attempt=cc.last_attempt)
+            mdname = re.sub(r'\.png$', '.yaml', output)
+            if mdname == output: mdname += ".yaml"
+            with open(mdname, 'w') as f:
+                yaml.dump(md, f, default_flow_style=False)
+
+    return {'ok': True, 'output': output, 'equation': str(fn), 'color_mode': mode,
+            'problem': problem, 'seed': cc.last_seed, 'attempt': cc.last_attempt,
+            'stats': stats, 'timings': tracer.summary()}
+
+def _plain(value):
+    # Stats hold numpy scalars (and big-int keys); make them JSON-friendly
+    if hasattr(value, 'item'):
+        value = value.item()
+    return value if isinstance(value, (int, float, str, bool, type(None))) else str(value)
+
+def run_worker(lines, out):
+    """Answer each job line read from lines with one result line on out.
+    Bad jobs get {"ok": false, "error": ...}; the worker carries on."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        start = time.perf_counter()
+        job_id = None
+        try:
+            job = json.loads(line)
+            job_id = job.get('id')
+            result = run_job(job)
+        except Exception as err:
+            result = {'ok': False, 'error': f"{type(err).__name__}: {err}"}
+        if 'stats' in result:
+            result['stats'] = {k: _plain(v) for k, v in result['stats'].items()}
+        result['id'] = job_id
+        result['seconds'] = round(time.perf_counter() - start, 6)
+        out.write(json.dumps(result) + "\n")
+        out.flush()
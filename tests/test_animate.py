@@ -0,0 +1,67 @@
+import io
+import os
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image
+from bitart.animate import Animation
+from bitart.compute import ComputeContext
+from bitart.generator import FunctionMaker
+from bitart.parser import EquationParser
+
+class TestAnimation(unittest.TestCase):
+    def setUp(self):
+        self.fn = EquationParser().parse("(((x * y) ^ (x - y)) % (t + 2)) + (x & y) * t")
+
+    def test_frames_match_full_evaluation(self):
+        for engine in ('numpy', 'python'):
+            cc = ComputeContext(depth=0, scale_power=3, engine=engine)
+            animation = Animation(cc, self.fn, frames=5)
+            coords = np.arange(cc.extent)
+            for t in range(5):
+                expected = cc.evaluate(self.fn, coords, coords, t=t).values
+                self.assertTrue((animation.frame(t).values == expected).all(), (engine, t))
+
+    def test_t_free_subtrees_are_hoisted(self):
+        animation = Animation(ComputeContext(depth=0, scale_power=3), self.fn, frames=5)
+        self.assertEqual(animation.hoisted, 2)
+        self.assertEqual(str(animation.tree), "(_static0 % (t + 2)) + (_static1 * t)")
+
+    def test_random_trees_with_t(self):
+        import random
+        cc = ComputeContext(depth=0, scale_power=3)
+        coords = np.arange(cc.extent)
+        maker = FunctionMaker(depth=4, rng=random.Random(3), variables=('x', 'y', 't'))
+        for _ in range(30):
+            fn = maker.make(7)
+            animation = Animation(cc, fn, frames=4)
+            for t in (0, 3):
+                expected = cc.evaluate(fn, coords, coords, t=t).values
+                self.assertTrue((animation.frame(t).values == expected).all(), str(fn))
+
+    def test_apng_frames(self):
+        cc = ComputeContext(depth=0, scale_power=3)
+        small = EquationParser().parse("((x ^ y) + t) % 9")
+        for fn, mode in ((self.fn, 'gradient'), (self.fn, 'rgb'), (small, 'rgb'), (small, 'onebit')):
+            animation = Animation(cc, fn, frames=4)
+            out = io.BytesIO()
+            stats = animation.render_apng(mode, out)
+            colormap = cc.create_color_function(mode, stats)
+
+            image = Image.open(io.BytesIO(out.getvalue()))
+            self.assertEqual(image.n_frames, 4)
+            for t in range(4):
+                image.seek(t)
+                expected = cc.render(animation.frame(t), colormap)
+                self.assertEqual(image.convert('RGB').tobytes(), expected.convert('RGB').tobytes(), (mode, t))
+
+    def test_frame_directory(self):
+        cc = ComputeContext(depth=0, scale_power=3)
+        with tempfile.TemporaryDirectory() as tmp:
+            Animation(cc, self.fn, frames=12).render_frames('onebit', tmp)
+            names = sorted(os.listdir(tmp))
+            self.assertEqual(names[0], "frame-00.png")
+            self.assertEqual(len(names), 12)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+from bitart import batch
+
+class TestBatch(unittest.TestCase):
+    def run_shard(self, outdir, shard, shards, count=4):
+        return batch.run_shard(3, count, shard, shards, outdir, depth=3, zoom=3)
+
+    def test_shards_split_batch_deterministically(self):
+        with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b:
+            whole = self.run_shard(a, 0, 1)
+            halves = self.run_shard(b, 0, 2) + self.run_shard(b, 1, 2)
+            self.assertEqual(sorted(r['index'] for r in halves), [0, 1, 2, 3])
+            by_index = {r['index']: r['equation'] for r in whole}
+            for record in halves:
+                self.assertEqual(record['equation'], by_index[record['index']])
+
+    def test_workers_share_one_pool_and_match_serial(self):
+        with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b:
+            serial = batch.run_shard(3, 4, 0, 1, a, depth=3, zoom=3)
+            parallel = batch.run_shard(3, 4, 0, 1, b, depth=3, zoom=3, workers=2)
+            self.assertEqual([r.get('equation') for r in parallel], [r.get('equation') for r in serial])
+
+    def test_resume_skips_recorded_images(self):
+        with tempfile.TemporaryDirectory() as outdir:
+            first = self.run_shard(outdir, 0, 1)
+            path = batch.manifest_path(outdir, 3, 0, 1)
+            # Simulate an interruption: lose one image and tear the last line
+            os.remove(os.path.join(outdir, first[1]['file']))
+            with open(path) as f:
+                lines = f.readlines()
+            with open(path, 'w') as f:
+                f.writelines(lines[:-1])
+                f.write(lines[-1][:20])
+
+            resumed = self.run_shard(outdir, 0, 1)
+            self.assertEqual(sorted(r['index'] for r in resumed), [0, 1, 2, 3])
+            self.assertEqual(len(batch.read_manifest(path)), 4)
+            self.assertEqual({r['equation'] for r in resumed}, {r['equation'] for r in first})
+
+    def test_merge_dedupes(self):
+        with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b:
+            self.run_shard(a, 0, 2)
+            self.run_shard(a, 1, 2)
+            # Another node redoing shard 1 produces the same images
+            self.run_shard(b, 1, 2)
+            paths = [batch.manifest_path(a, 3, 0, 2), batch.manifest_path(a, 3, 1, 2),
+                     batch.manifest_path(b, 3, 1, 2)]
+            catalog = batch.merge_manifests(paths)
+            self.assertEqual([r['index'] for r in catalog], [0, 1, 2, 3])
+            self.assertTrue(all(os.path.exists(r['file']) for r in catalog))
+
+if __name__ == '__main__':
+    unittest.main()
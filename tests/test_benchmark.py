@@ -0,0 +1,24 @@
+import unittest
+from bitart.benchmark import compare, run_suite
+
+class TestBenchmark(unittest.TestCase):
+    def test_suite_times_every_stage(self):
+        results = run_suite(depths=(2,), zooms=(3,), modes=('onebit', 'rgb'), equations=("x ^ y",),
+                            candidates=2, repeat=1)
+        self.assertEqual(set(results['cases']), {'random-d2-z3', 'equation0-z3'})
+        case = results['cases']['random-d2-z3']
+        self.assertEqual(set(case['stages']), {'make', 'compute', 'analysis', 'stripes', 'render:onebit',
+                                               'save:onebit', 'render:rgb', 'save:rgb'})
+        self.assertEqual(case['candidates'], 2)
+        self.assertGreater(case['pixels_per_s'], 0)
+        self.assertNotIn('make', results['cases']['equation0-z3']['stages'])
+
+    def test_compare_flags_slower_stages(self):
+        baseline = {'cases': {'a': {'stages': {'compute': 0.010, 'render': 0.020, 'save': 0.0001}}}}
+        results = {'cases': {'a': {'stages': {'compute': 0.020, 'render': 0.021, 'save': 0.0009}},
+                             'new': {'stages': {'compute': 1.0}}}}
+        self.assertEqual(compare(results, baseline), [('a', 'compute', 0.010, 0.020)])
+        self.assertEqual(compare(results, baseline, tolerance=1.5), [])
+
+if __name__ == '__main__':
+    unittest.main()
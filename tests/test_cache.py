@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from bitart.cache import GridCache, grid_key
+from bitart.compute import ComputeContext
+from bitart.grid import Grid
+from bitart.parser import EquationParser
+
+parse = EquationParser().parse
+
+def churn(directory, worker, rounds=300):
+    # One process's share of a cache directory too small for all of them:
+    # every put evicts files the other processes are reading or evicting
+    cache = GridCache(directory, memory_items=0, disk_bytes=4 * 32 * 32 * 8)
+    rng = np.random.default_rng(worker)
+    hits = 0
+    for n in range(rounds):
+        key = f"{rng.integers(12):064x}"
+        grid = cache.get(key)
+        if grid is not None:
+            hits += 1
+            assert (grid.points == int(key, 16)).all()
+        else:
+            grid = Grid(32, 32)
+            grid.fill(int(key, 16))
+            cache.put(key, grid)
+    return hits
+
+class TestGridCache(unittest.TestCase):
+    def test_render_custom_hits_across_colour_modes(self):
+        cache = GridCache()
+        fn = parse("(x * y) % 7")
+        first = ComputeContext(depth=2, scale_power=3, cache=cache, color_override='onebit')
+        second = ComputeContext(depth=2, scale_power=3, cache=cache, color_override='rgb')
+        expected = first.render_custom(fn)[2]
+        self.assertEqual(second.render_custom(parse("((x * y) % 7) % 7"))[2], expected)
+        self.assertEqual(first.counters['cache_misses'], 1)
+        self.assertEqual(second.counters['cache_hits'], 1)
+
+    def test_key_depends_on_extent(self):
+        fn = parse("x ^ y")
+        self.assertNotEqual(grid_key(fn, 64, 8), grid_key(fn, 128, 4))
+        self.assertEqual(grid_key(fn, 64, 8), grid_key(parse("(x ^ y) + 0"), 64, 8))
+
+    def test_disk_tier_persists_and_evicts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cc = ComputeContext(depth=2, scale_power=3, cache=GridCache(directory))
+            grid = cc.compute(parse("x | y"))
+
+            fresh = ComputeContext(depth=2, scale_power=3, cache=GridCache(directory))
+            self.assertEqual(fresh.compute(parse("x | y")).points.tolist(), grid.points.tolist())
+            self.assertEqual(fresh.counters['cache_hits'], 1)
+
+            # Room for only one 64x64 grid: older files go
+            small = GridCache(directory, disk_bytes=64 * 64 * grid.points.itemsize + 1024)
+            for equation in ("x & y", "x + y", "x - y"):
+                small.put(grid_key(parse(equation), 64, 8), cc.compute(parse(equation)))
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+    def test_memory_lru_and_big_values(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = GridCache(directory, memory_items=2)
+            cc = ComputeContext(depth=2, scale_power=3, cache=cache)
+            cc.compute(parse("x * 18446744073709551616"))
+            cc.compute(parse("x"))
+            cc.compute(parse("y"))
+            self.assertEqual(len(cache.memory), 2)
+            # The big-int grid was never written to disk
+            self.assertEqual(len(os.listdir(directory)), 2)
+
+    def test_processes_share_a_directory(self):
+        # Files vanish between listdir, stat, load and remove; that's a miss
+        # or an entry already gone, never an error
+        with tempfile.TemporaryDirectory() as directory:
+            with ProcessPoolExecutor(max_workers=4) as pool:
+                hits = list(pool.map(churn, [directory] * 4, range(4)))
+            self.assertTrue(all(hits))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+import yaml
+from bitart import batch
+from bitart.catalog import Catalog, import_yaml
+from bitart.cli import make_metadata
+from bitart.parser import EquationParser
+
+def metadata(equation, mode='onebit', depth=4, zoom=1, **stats):
+    stats = dict({'num_keys': 2, 'min_key': 0, 'max_key': 1, 'most_common_key': 0,
+                  'most_common_key_count': 10, 'density': 1.0, 'dominance': 0.5}, **stats)
+    return make_metadata(EquationParser().parse(equation), stats, mode, None, depth, None, zoom, seed=7, attempt=2)
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "catalog.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_and_filters(self):
+        with Catalog(self.path, batch_rows=2) as catalog:
+            catalog.add(metadata("x ^ y", density=0.75), "a.png")
+            catalog.add(metadata("x & y", mode='rgb', depth=6, density=0.6), "b.png")
+            catalog.add(metadata("x | y", depth=6, density=0.4, zoom=3), "c.png")
+            # Same file again: replaced, not duplicated
+            catalog.add(metadata("x | y", depth=6, density=0.55, zoom=3), "c.png")
+
+        with Catalog(self.path) as catalog:
+            self.assertEqual(len(catalog), 3)
+            rows = catalog.query("color_mode = ? AND depth = ? AND density > ?", ('onebit', 6, 0.5))
+            self.assertEqual([row['file'] for row in rows], ["c.png"])
+            row = rows[0]
+            self.assertEqual(row['equation'], "x | y")
+            self.assertEqual((row['zoom'], row['scale'], row['extent']), (3, 8, 64))
+            self.assertEqual((row['seed'], row['attempt']), (7, 2))
+            self.assertEqual(str(EquationParser().parse(row['equation'])), "x | y")
+            ordered = catalog.query(order_by="density DESC", limit=2)
+            self.assertEqual([row['file'] for row in ordered], ["a.png", "b.png"])
+
+    def test_big_integers_kept_exactly(self):
+        with Catalog(self.path) as catalog:
+            catalog.add(metadata("x * y", min_key=-(1 << 70), max_key=1 << 80, most_common_key=3), "big.png")
+            row = catalog.query()[0]
+        self.assertEqual(int(row['min_key']), -(1 << 70))
+        self.assertEqual(int(row['max_key']), 1 << 80)
+        self.assertEqual(row['most_common_key'], 3)
+
+    def test_import_yaml_sidecars(self):
+        sub = os.path.join(self.tmp.name, "images", "more")
+        os.makedirs(sub)
+        for directory, name, equation in ((self.tmp.name, "one", "x ^ y"), (sub, "two", "x - y")):
+            with open(os.path.join(directory, name + ".png"), 'wb'):
+                pass
+            with open(os.path.join(directory, name + ".yaml"), 'w') as f:
+                yaml.dump(metadata(equation), f, default_flow_style=False)
+        with open(os.path.join(sub, "notes.yaml"), 'w') as f:
+            yaml.dump(['not', 'metadata'], f)
+
+        skipped = []
+        with Catalog(self.path) as catalog:
+            added = import_yaml(catalog, [self.tmp.name],
+                                progress=lambda name, ok: ok or skipped.append(os.path.basename(name)))
+            files = sorted(row['file'] for row in catalog.query())
+        self.assertEqual(added, 2)
+        self.assertEqual(skipped, ["notes.yaml"])
+        self.assertEqual(files, sorted([os.path.join(self.tmp.name, "one.png"), os.path.join(sub, "two.png")]))
+
+    def test_batch_records_into_catalog(self):
+        outdir = os.path.join(self.tmp.name, "out")
+        with Catalog(self.path) as catalog:
+            records = batch.run_shard(3, 3, 0, 1, outdir, depth=3, zoom=3, catalog=catalog)
+        made = [r for r in records if r['file'] is not None]
+        with Catalog(self.path) as catalog:
+            rows = {row['file']: row for row in catalog.query()}
+        self.assertEqual(len(rows), len(made))
+        for record in made:
+            row = rows[os.path.join(outdir, record['file'])]
+            self.assertEqual("f(x,y) = " + row['equation'], record['equation'])
+            self.assertEqual(row['density'], record['density'])
+
+if __name__ == '__main__':
+    unittest.main()
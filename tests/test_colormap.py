@@ -0,0 +1,91 @@
+import math
+import unittest
+import numpy as np
+from bitart.colormap import Colormap, colormap_names, create_colormap, register_colormap, COLORMAPS
+
+def reference_color_function(mode, stats):
+    # The per-value closures colour modes used to be
+    min_key, max_key, most_common = stats['min_key'], stats['max_key'], stats['most_common_key']
+    denom = float(max_key - min_key)
+    if denom == 0: denom = 1.0
+
+    def mag(n):
+        return max(0.0, min(1.0, (n - min_key) / denom))
+
+    if mode == 'onebit':
+        return lambda n: (0, 0, 0) if n == most_common else (255, 255, 255)
+    if mode == 'gradient':
+        return lambda n: (int(mag(n) * 255),) * 3
+    if mode == 'rgb':
+        return lambda n: (int(255 * mag(n)), int(255 * math.sin(math.pi * mag(n))),
+                          int(255 * math.cos(0.5 * math.pi * mag(n))))
+    single = {'red': (1.0, 0.0, 0.0), 'green': (0.0, 1.0, 0.0), 'blue': (0.0, 0.0, 1.0),
+              'cyan': (0.0, 1.0, 1.0), 'magenta': (1.0, 0.0, 1.0), 'yellow': (1.0, 1.0, 0.0),
+              'orange': (1.0, 0.647, 0.0), 'grey': (1.0, 1.0, 1.0), 'gray': (1.0, 1.0, 1.0)}
+    if mode in single:
+        r, g, b = single[mode]
+        return lambda n: (int(mag(n) * 255 * r), int(mag(n) * 255 * g), int(mag(n) * 255 * b))
+    return lambda n: (128, 128, 128)
+
+def stats_for(values):
+    keys, counts = np.unique(values, return_counts=True)
+    return {'min_key': int(keys[0]), 'max_key': int(keys[-1]), 'num_keys': int(keys.size),
+            'most_common_key': int(keys[counts.argmax()])}
+
+class TestColormaps(unittest.TestCase):
+    def check(self, values):
+        stats = stats_for(values)
+        for mode in colormap_names() + ['no-such-mode']:
+            reference = reference_color_function(mode, stats)
+            expected = np.array([reference(n) for n in values.reshape(-1).tolist()],
+                                dtype=np.uint8).reshape(values.shape + (3,))
+            colormap = create_colormap(mode, stats)
+            # Both the lookup-table and the fully vectorized path
+            self.assertTrue(np.array_equal(colormap.apply(values), expected), mode)
+            self.assertTrue(np.array_equal(self.image_colors(colormap, values), expected), mode)
+            colormap.num_keys = 1 << 30
+            self.assertTrue(np.array_equal(colormap.apply(values), expected), mode)
+            self.assertTrue(np.array_equal(self.image_colors(colormap, values), expected), mode)
+
+    def image_colors(self, colormap, values):
+        # The colours image_array's compact form stands for
+        array, mode, palette = colormap.image_array(values)
+        if mode == 'P':
+            return palette[array]
+        if mode in ('1', 'L'):
+            return np.repeat(array[..., np.newaxis], 3, axis=-1)
+        return array
+
+    def test_few_keys(self):
+        self.check(np.random.default_rng(1).integers(0, 13, size=(40, 30)))
+
+    def test_many_keys(self):
+        self.check(np.random.default_rng(2).integers(-100000, 100000, size=(200, 200)))
+
+    def test_huge_range_and_big_ints(self):
+        rng = np.random.default_rng(3)
+        self.check(rng.integers(np.iinfo(np.int64).min, np.iinfo(np.int64).max, size=(50, 50)))
+        big = np.array([(1 << 70) * int(v) for v in rng.integers(-50, 50, size=100)], dtype=object)
+        self.check(big.reshape(10, 10))
+
+    def test_custom_colormap_gets_fast_path(self):
+        calls = []
+
+        @register_colormap('test-parity')
+        class Parity(Colormap):
+            def color(self, n):
+                calls.append(n)
+                return (255, 0, 0) if n % 2 else (0, 0, 255)
+
+        try:
+            values = np.random.default_rng(4).integers(0, 5, size=(64, 64))
+            rgb = create_colormap('test-parity', stats_for(values)).apply(values)
+            self.assertEqual(rgb.shape, (64, 64, 3))
+            self.assertEqual(tuple(rgb[values == 3][0]), (255, 0, 0))
+            # One call per distinct value, not per pixel
+            self.assertEqual(sorted(calls), [0, 1, 2, 3, 4])
+        finally:
+            del COLORMAPS['test-parity']
+
+if __name__ == '__main__':
+    unittest.main()
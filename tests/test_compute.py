@@ -0,0 +1,232 @@
+import io
+import pickle
+import random
+from concurrent.futures import ProcessPoolExecutor
+import unittest
+from PIL import Image, ImageDraw
+from bitart.compute import ComputeContext, save_png
+from bitart.parser import EquationParser
+
+COLOR_MODES = ['onebit', 'gradient', 'rgb', 'red', 'green', 'blue', 'cyan',
+               'magenta', 'yellow', 'orange', 'grey', 'unknown']
+
+def reference_render(cc, pixels, color_func):
+    # The original one-rectangle-per-cell renderer
+    image = Image.new("RGB", (cc.extent * cc.scale, cc.extent * cc.scale))
+    draw = ImageDraw.Draw(image)
+    for x, y, val in pixels.each_pos():
+        s = cc.scale
+        draw.rectangle([x * s, y * s, (x + 1) * s - 1, (y + 1) * s - 1], fill=color_func(val), outline=None)
+    return image
+
+class TestRender(unittest.TestCase):
+    def test_render_matches_reference(self):
+        fn = EquationParser().parse("(x * y) ^ (x - y)")
+        for zoom in (2, 3):
+            cc = ComputeContext(depth=2, scale_power=zoom)
+            pixels = cc.compute(fn)
+            stats = pixels.analysis()
+            for mode in COLOR_MODES:
+                color_func = cc.create_color_function(mode, stats)
+                expected = reference_render(cc, pixels, color_func)
+                image = cc.render(pixels, color_func)
+                self.assertEqual(image.convert('RGB').tobytes(), expected.tobytes(), mode)
+
+    def test_compact_modes_save_same_colours(self):
+        cc = ComputeContext(depth=2, scale_power=2)
+        pixels = cc.compute(EquationParser().parse("((x * y) & (x ^ y)) % 11"))
+        stats = pixels.analysis()
+        for mode, image_mode in (('onebit', '1'), ('gradient', 'L'), ('grey', 'L'), ('rgb', 'P'), ('orange', 'P')):
+            color_func = cc.create_color_function(mode, stats)
+            image = cc.render(pixels, color_func)
+            self.assertEqual(image.mode, image_mode, mode)
+            expected = reference_render(cc, pixels, color_func).tobytes()
+            for options in ({}, {'level': 9}, {'level': 0}, {'fast': True}):
+                out = io.BytesIO()
+                save_png(image, out, **options)
+                saved = Image.open(io.BytesIO(out.getvalue()))
+                self.assertEqual(saved.mode, image_mode, mode)
+                self.assertEqual(saved.convert('RGB').tobytes(), expected, (mode, options))
+
+    def test_compute_and_render_size(self):
+        random.seed(5)
+        cc = ComputeContext(depth=3, scale_power=3)
+        image = cc.compute_and_render()[0]
+        self.assertEqual(image.size, (512, 512))
+
+class TestStripes(unittest.TestCase):
+    def test_stripes_count_matches_per_index_search(self):
+        random.seed(11)
+        cc = ComputeContext(depth=3, scale_power=3)
+        for equation in ["x % 4", "(x ^ y) % 3", "y * 2", "(x * y) % 7"]:
+            pixels = cc.compute(EquationParser().parse(equation))
+            vcount = sum(pixels.repeated_pattern(i, vertical=True, maxlen=16) is not None for i in range(cc.extent))
+            hcount = sum(pixels.repeated_pattern(i, vertical=False, maxlen=16) is not None for i in range(cc.extent))
+            striped = (vcount / cc.extent > 0.95) or (hcount / cc.extent > 0.95)
+            self.assertEqual(cc.stripes_count(pixels), (striped, hcount, vcount), equation)
+
+class TestScreening(unittest.TestCase):
+    def test_screen_rejects_only_clearly_boring(self):
+        cc = ComputeContext(depth=3, scale_power=0)
+        parse = EquationParser().parse
+        self.assertEqual(cc.screen_candidate(parse("x - x")), "Screened: a single value on a 128x128 sample")
+        self.assertIsNone(cc.screen_candidate(parse("(x ^ y) % 5")))
+        self.assertIsNone(cc.screen_candidate(parse("x & 1")))
+        self.assertEqual(cc.counters['screened'], 3)
+        self.assertEqual(cc.counters['full_evaluations_avoided'], 1)
+
+    def test_lattice_includes_edges(self):
+        for zoom in (0, 1):
+            xs, ys = ComputeContext(depth=3, scale_power=zoom).screen_lattice()
+            extent = 512 >> zoom
+            for coords in (xs, ys):
+                self.assertEqual((coords[0], coords[-1]), (0, extent - 1))
+                self.assertEqual(len(set(coords.tolist())), len(coords))
+
+    def test_zero_row_and_column_are_seen(self):
+        # Only x = 0 and y = 0 differ here (the safe_div/safe_mod zero cases),
+        # yet the image has 13 values and dominance 0.9766: review accepts it
+        fn = EquationParser().parse("(((-(12 / y)) / ((x * 15) + (x / y))) % (((20 & y) + (x / x)) + "
+                                    "((24 * y) ^ (x - 12)))) % 13")
+        for zoom in (0, 1):
+            cc = ComputeContext(depth=3, scale_power=zoom)
+            pixels = cc.compute(fn)
+            self.assertIsNone(cc.review_image(pixels, pixels.analysis()))
+            self.assertIsNone(cc.screen_candidate(fn))
+
+    def test_screen_rejects_only_what_review_rejects(self):
+        for depth in (2, 4, 5, 7):
+            for zoom in (0, 1, 2):
+                cc = ComputeContext(depth=depth, scale_power=zoom)
+                for seed in (23, 102):
+                    for attempt in range(40):
+                        fn, modulo = cc.make_candidate(seed, attempt)
+                        if cc.screen_candidate(fn):
+                            pixels = cc.compute(fn)
+                            self.assertIsNotNone(cc.review_image(pixels, pixels.analysis()),
+                                                 f"depth {depth} zoom {zoom}: {fn}")
+
+    def test_nearly_solid_sample_is_reviewed(self):
+        # Its 64x64 sample is 0.9998 one value, the whole grid only 0.9738:
+        # review accepts it, so screening must not reject it
+        cc = ComputeContext(depth=7, scale_power=1)
+        fn, modulo = cc.make_candidate(102, 1)
+        self.assertIsNone(cc.screen_candidate(fn))
+        pixels = cc.compute(fn)
+        self.assertIsNone(cc.review_image(pixels, pixels.analysis()))
+        # So the search settles on the same attempt either way
+        attempts = []
+        for screen in (True, False):
+            cc = ComputeContext(depth=7, scale_power=1, screen=screen)
+            cc.seed = 102
+            cc.compute_and_render()
+            attempts.append(cc.last_attempt)
+        self.assertEqual(attempts, [1, 1])
+
+    def test_small_images_are_not_screened(self):
+        cc = ComputeContext(depth=3, scale_power=3)
+        self.assertIsNone(cc.screen_lattice())
+
+    def test_result_confirmed_by_full_review(self):
+        random.seed(21)
+        cc = ComputeContext(depth=4, scale_power=1)
+        image, fn, stats, mode, modulo, problem = cc.compute_and_render()
+        self.assertIsNone(problem)
+        prechecked = sum(n for key, n in cc.counters.items() if key.startswith('prechecked_'))
+        self.assertEqual(cc.counters['screened'] + prechecked,
+                         cc.counters['full_evaluations'] + cc.counters['full_evaluations_avoided'])
+
+class TestPrecheck(unittest.TestCase):
+    def full_review(self, cc, fn):
+        pixels = cc.compute(fn)
+        return cc.review_image(pixels, pixels.analysis())
+
+    def test_verdicts_match_full_review(self):
+        cc = ComputeContext(depth=3, scale_power=1)
+        parse = EquationParser().parse
+        for text in ("x - x", "(x & 16) % 8", "((x * 4) | 3) & 3", "x ^ 5", "(y * 7) % 3",
+                     "x * x", "(y & 7) + 1", "(x - y) & 0"):
+            fn = parse(text)
+            problem = cc.precheck_candidate(fn)
+            self.assertIsNotNone(problem, text)
+            self.assertEqual(problem, self.full_review(cc, fn), text)
+
+    def test_masked_modulus_is_solid(self):
+        cc = ComputeContext(depth=3)
+        self.assertEqual(cc.precheck_candidate(EquationParser().parse("(x & 16) % 8")), "Solid colour")
+        self.assertEqual(cc.counters['prechecked_solid'], 1)
+
+    def test_two_variable_trees_are_left_alone(self):
+        cc = ComputeContext(depth=3)
+        self.assertIsNone(cc.precheck_candidate(EquationParser().parse("(x ^ y) % 5")))
+        self.assertEqual(cc.counters['full_evaluations_avoided'], 0)
+
+    def test_random_candidates_agree_with_full_review(self):
+        cc = ComputeContext(depth=3, scale_power=2)
+        rejected = 0
+        for attempt in range(300):
+            fn, modulo = cc.make_candidate(5, attempt)
+            problem = cc.precheck_candidate(fn)
+            if problem is not None:
+                rejected += 1
+                self.assertEqual(problem, self.full_review(cc, fn), str(fn))
+        self.assertGreater(rejected, 0)
+        self.assertEqual(rejected, cc.counters['full_evaluations_avoided'])
+
+class TestBands(unittest.TestCase):
+    def test_banded_matches_single_band(self):
+        parse = EquationParser().parse
+        single = ComputeContext(depth=4, threads=1)
+        banded = ComputeContext(depth=4, threads=3)
+        fns = [parse(text) for text in ("(x ^ y) % 9", "x * y", "(y & 12) + 3", "x - 7")]
+        fns += [single.make_candidate(3, attempt)[0] for attempt in range(20)]
+        for engine in ('numpy', 'postfix'):
+            single.engine = banded.engine = engine
+            for fn in fns:
+                expected, none = single.compute_with_histogram(fn)
+                result, histogram = banded.compute_with_histogram(fn)
+                self.assertIsNone(none)
+                self.assertEqual(result.points.dtype, expected.points.dtype, str(fn))
+                self.assertTrue((result.points == expected.points).all(), str(fn))
+                self.assertEqual(banded.analysis(result, histogram), expected.analysis(), str(fn))
+        self.assertEqual(banded.counters['bands'], 3 * 2 * len(fns))
+        self.assertEqual(single.counters['bands'], 0)
+
+    def test_bands_cover_rows(self):
+        cc = ComputeContext(depth=2, threads=5)
+        self.assertEqual(cc.bands(1024, 1024), [(0, 204), (204, 409), (409, 614), (614, 819), (819, 1024)])
+        # Small grids stay whole
+        self.assertEqual(cc.bands(64, 64), [(0, 64)])
+
+class TestParallelSearch(unittest.TestCase):
+    def test_parallel_matches_serial(self):
+        # Seed 12 is accepted only at attempt 8, so several rejections come first
+        serial = ComputeContext(depth=2, scale_power=2, seed=12)
+        parallel = ComputeContext(depth=2, scale_power=2, seed=12, workers=3)
+        expected = serial.compute_and_render()
+        result = parallel.compute_and_render()
+        self.assertEqual(str(result[1]), str(expected[1]))
+        self.assertEqual(result[2], expected[2])
+        self.assertEqual(result[0].tobytes(), expected[0].tobytes())
+        self.assertEqual(parallel.last_attempt, serial.last_attempt)
+        self.assertGreater(parallel.last_attempt, 1)
+
+    def test_shared_executor_reused_across_runs(self):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            for seed in (12, 5, 12):
+                serial = ComputeContext(depth=2, scale_power=2, seed=seed)
+                shared = ComputeContext(depth=2, scale_power=2, seed=seed, workers=2, executor=executor)
+                self.assertEqual(str(shared.compute_and_render()[1]), str(serial.compute_and_render()[1]))
+                self.assertEqual(shared.last_attempt, serial.last_attempt)
+                # The pool outlives the search and isn't shipped to its own workers
+                self.assertIsNone(pickle.loads(pickle.dumps(shared)).executor)
+            self.assertEqual(executor.submit(abs, -3).result(), 3)
+
+    def test_attempt_reproducible_alone(self):
+        cc = ComputeContext(depth=5, scale_power=2, seed=99)
+        fn = cc.compute_and_render()[1]
+        again, _ = ComputeContext(depth=5, seed=99).make_candidate(99, cc.last_attempt)
+        self.assertEqual(str(again), str(fn))
+
+if __name__ == '__main__':
+    unittest.main()
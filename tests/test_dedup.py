@@ -0,0 +1,108 @@
+import os
+import pickle
+import tempfile
+import unittest
+from bitart import batch
+from bitart.compute import ComputeContext
+from bitart.dedup import HEADER, KEY_BYTES, RECORD_BYTES, DedupIndex, function_key, owner_key
+from bitart.parser import EquationParser
+
+class TestDedupIndex(unittest.TestCase):
+    def test_equivalent_functions_share_a_key(self):
+        parse = EquationParser().parse
+        self.assertEqual(function_key(parse("(x ^ y) + 3"), 2), function_key(parse("3 + (y ^ x)"), 2))
+        self.assertNotEqual(function_key(parse("x ^ y"), 2), function_key(parse("x ^ y"), 4))
+        self.assertNotEqual(function_key(parse("x - y")), function_key(parse("y - x")))
+
+    def test_persistence(self):
+        parse = EquationParser().parse
+        mine, other = owner_key(5, 1), owner_key(5, 2)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index")
+            index = DedupIndex(path)
+            self.assertFalse(index.is_duplicate(function_key(parse("x ^ y")), mine))
+            # Looking is not recording
+            self.assertEqual(len(index), 0)
+            index.record(function_key(parse("x ^ y")), mine)
+            self.assertTrue(index.is_duplicate(function_key(parse("y ^ x")), other))
+            # The attempt that made the image is not a duplicate of itself
+            self.assertFalse(index.is_duplicate(function_key(parse("y ^ x")), mine))
+            index.record(function_key(parse("x & y")), other)
+            self.assertEqual((index.lookups, index.hits, index.hit_rate), (3, 1, 1 / 3))
+            index.close()
+
+            # A torn record from an interrupted write is dropped
+            with open(path, 'ab') as f:
+                f.write(b"torn")
+            reopened = DedupIndex(path)
+            self.assertEqual(len(reopened), 2)
+            self.assertTrue(reopened.is_duplicate(function_key(parse("x & y")), mine))
+            reopened.record(function_key(parse("x | y")), mine)
+            reopened.close()
+            self.assertEqual(os.path.getsize(path), len(HEADER) + 3 * RECORD_BYTES)
+            self.assertEqual(len(DedupIndex(path)), 3)
+
+    def test_rejects_foreign_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index")
+            with open(path, 'wb') as f:
+                f.write(b"k" * KEY_BYTES * 2)
+            with self.assertRaises(ValueError):
+                DedupIndex(path)
+
+    def test_pickled_copies_are_empty(self):
+        index = DedupIndex()
+        index.record(b"k" * KEY_BYTES, owner_key(1, 1))
+        self.assertEqual(len(pickle.loads(pickle.dumps(index))), 0)
+
+class TestSearchDedup(unittest.TestCase):
+    def test_images_made_elsewhere_are_skipped(self):
+        for workers in (1, 2):
+            index = DedupIndex()
+            first = ComputeContext(depth=2, scale_power=2, seed=12, workers=workers, dedup=index)
+            fn = first.compute_and_render()[1]
+            # Only the accepted function is recorded
+            self.assertEqual(list(index.keys), [function_key(fn, first.scale)])
+
+            # Rerunning the same search is not a duplicate of itself...
+            rerun = ComputeContext(depth=2, scale_power=2, seed=12, workers=workers, dedup=index)
+            self.assertEqual(str(rerun.compute_and_render()[1]), str(fn))
+            self.assertEqual(rerun.counters['duplicates'], 0)
+
+            # ...but an image from another search makes that function a repeat
+            other = DedupIndex()
+            other.record(function_key(fn, first.scale), owner_key(99, 1))
+            again = ComputeContext(depth=2, scale_power=2, seed=12, workers=workers, dedup=other)
+            again.compute_and_render()
+            self.assertEqual(again.counters['duplicates'], 1)
+            self.assertEqual(again.counters['rejected_duplicate'], 1)
+            self.assertGreater(again.last_attempt, first.last_attempt)
+
+    def test_index_independent_of_workers(self):
+        indexes = []
+        for workers in (1, 3):
+            index = DedupIndex()
+            for seed in range(4):
+                ComputeContext(depth=2, scale_power=2, seed=seed, workers=workers, dedup=index).compute_and_render()
+            indexes.append(index.keys)
+        self.assertEqual(indexes[0], indexes[1])
+
+    def test_resumed_batch_reproduces_its_slice(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            outdir = os.path.join(tmp, "out")
+            path = os.path.join(tmp, "index")
+            first = batch.run_shard(11, 3, 0, 1, outdir, depth=3, zoom=3, dedup=DedupIndex(path))
+            # Crash before the last image's manifest line was written
+            manifest = batch.manifest_path(outdir, 11, 0, 1)
+            with open(manifest) as f:
+                lines = f.readlines()
+            with open(manifest, 'w') as f:
+                f.writelines(lines[:-1])
+            if first[-1]['file']:
+                os.remove(os.path.join(outdir, first[-1]['file']))
+
+            resumed = batch.run_shard(11, 3, 0, 1, outdir, depth=3, zoom=3, dedup=DedupIndex(path))
+            self.assertEqual([r.get('equation') for r in resumed], [r.get('equation') for r in first])
+
+if __name__ == '__main__':
+    unittest.main()
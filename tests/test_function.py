@@ -0,0 +1,95 @@
+import random
+import unittest
+import numpy as np
+from bitart.function import Expression, Literal, Lookup, safe_div, safe_mod
+from bitart.generator import FunctionMaker
+from bitart.parser import EquationParser
+
+EXTENT = 24
+
+def per_pixel(fn, extent=EXTENT):
+    return [fn({'x': x, 'y': y}) for y in range(extent) for x in range(extent)]
+
+def vectorized(fn, extent=EXTENT):
+    ys, xs = np.indices((extent, extent), dtype=np.int64)
+    values = fn.evaluate_array({'x': xs, 'y': ys})
+    return np.broadcast_to(values, xs.shape).ravel().tolist()
+
+class TestArrayEvaluation(unittest.TestCase):
+    def test_safe_ops_match(self):
+        a = np.array([0, 0, 7, -7, 7, -7, 9, -9], dtype=np.int64)
+        b = np.array([0, 3, 0, 0, -2, 2, 4, 4], dtype=np.int64)
+        from bitart.function import array_safe_div, array_safe_mod
+        self.assertEqual(array_safe_div(a, b).tolist(),
+                         [safe_div(int(i), int(j)) for i, j in zip(a, b)])
+        self.assertEqual(array_safe_mod(a, b).tolist(),
+                         [safe_mod(int(i), int(j)) for i, j in zip(a, b)])
+
+    def test_literal_only(self):
+        fn = Expression('*', Literal(3), Literal(7))
+        self.assertEqual(vectorized(fn), [21] * (EXTENT * EXTENT))
+
+    def test_overflow_falls_back_to_python_ints(self):
+        fn = EquationParser().parse("x * 4611686018427387904 * y")
+        self.assertEqual(vectorized(fn), per_pixel(fn))
+        fn = EquationParser().parse("-(x - 9223372036854775807 - 1 - 1)")
+        self.assertEqual(vectorized(fn), per_pixel(fn))
+        fn = Expression('+', Lookup('x'), Literal(1 << 80))
+        self.assertEqual(vectorized(fn), per_pixel(fn))
+
+    def test_random_functions_match(self):
+        random.seed(1234)
+        for depth in range(1, 8):
+            for _ in range(10):
+                fn = FunctionMaker(depth=depth).make(random.choice([None, 5, 13]))
+                self.assertEqual(vectorized(fn), per_pixel(fn), str(fn))
+
+class TestSeparable(unittest.TestCase):
+    def test_variables(self):
+        parse = EquationParser().parse
+        self.assertEqual(parse("3 * 7").variables, frozenset())
+        self.assertEqual(parse("(x * 7) ^ 13").variables, {'x'})
+        self.assertEqual(parse("~(y % 3)").variables, {'y'})
+        self.assertEqual(parse("((x * 7) ^ 13) + y").variables, {'x', 'y'})
+
+    def test_subtrees_stay_one_dimensional(self):
+        xs = np.arange(EXTENT, dtype=np.int64)
+        context = {'x': xs.reshape(1, -1), 'y': xs.reshape(-1, 1)}
+        fn = EquationParser().parse("((x * 7) ^ 13) - ((y / 3) | 5)")
+        self.assertEqual(fn.lhs.evaluate_array(context).shape, (1, EXTENT))
+        self.assertEqual(fn.rhs.evaluate_array(context).shape, (EXTENT, 1))
+        self.assertEqual(fn.evaluate_array(context).shape, (EXTENT, EXTENT))
+        self.assertEqual(fn.evaluate_array(context).ravel().tolist(), per_pixel(fn))
+
+    def test_broadcast_matches_per_pixel(self):
+        random.seed(77)
+        xs = np.arange(EXTENT, dtype=np.int64)
+        context = {'x': xs.reshape(1, -1), 'y': xs.reshape(-1, 1)}
+        for depth in range(1, 8):
+            for _ in range(10):
+                fn = FunctionMaker(depth=depth).make(random.choice([None, 4, 11]))
+                values = np.broadcast_to(fn.evaluate_array(context), (EXTENT, EXTENT))
+                self.assertEqual(values.ravel().tolist(), per_pixel(fn), str(fn))
+
+class TestCompile(unittest.TestCase):
+    def test_compiled_matches_tree(self):
+        random.seed(99)
+        for depth in range(1, 8):
+            fn = FunctionMaker(depth=depth).make(random.choice([None, 7]))
+            f = fn.compile()
+            self.assertEqual([f(x, y) for y in range(EXTENT) for x in range(EXTENT)],
+                             per_pixel(fn), str(fn))
+
+    def test_safe_ops_and_unary(self):
+        fn = EquationParser().parse("(-x / (y - 3)) % ~(y % 4)")
+        f = fn.compile()
+        self.assertEqual([f(x, y) for y in range(EXTENT) for x in range(EXTENT)],
+                         per_pixel(fn))
+
+    def test_compiled_is_cached(self):
+        fn = EquationParser().parse("x ^ y")
+        self.assertIs(fn.compile(), fn.compile())
+        self.assertIn("(x ^ y)", fn._source)
+
+if __name__ == '__main__':
+    unittest.main()
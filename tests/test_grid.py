@@ -0,0 +1,73 @@
+import unittest
+from collections import Counter
+import numpy as np
+from bitart.grid import Grid
+
+class TestGrid(unittest.TestCase):
+    def test_views_share_storage(self):
+        g = Grid(4, 3)
+        g.set_points(range(12))
+        self.assertEqual(g.row(1).tolist(), [4, 5, 6, 7])
+        self.assertEqual(g.column(2).tolist(), [2, 6, 10])
+        g[2, 1] = 99
+        self.assertEqual(g.row(1)[2], 99)
+        self.assertTrue(np.shares_memory(g.column(2), g.points))
+
+    def test_bounds(self):
+        g = Grid(4, 3)
+        for xy in [(4, 0), (0, 3), (-1, 0), (0, -1)]:
+            with self.assertRaises(IndexError):
+                g[xy]
+
+    def test_big_values_fall_back_to_objects(self):
+        g = Grid(3, 3, dtype=np.int32)
+        g.fill(7)
+        self.assertEqual(g.points.dtype, np.int32)
+        g[1, 1] = 1 << 40
+        self.assertEqual(g.points.dtype, object)
+        self.assertEqual(g[1, 1], 1 << 40)
+        g.map_inplace(lambda x, y, v: v * (1 << 70))
+        self.assertEqual(g[0, 0], 7 << 70)
+
+    def test_analysis_sees_writes_through_views(self):
+        g = Grid(4, 3)
+        g.fill(1)
+        self.assertEqual(g.analysis()['num_keys'], 1)
+        g.row(0)[:] = 7
+        self.assertEqual(g.analysis()['num_keys'], 2)
+        g.column(1)[:] = 9
+        self.assertEqual(g.analysis()['num_keys'], 3)
+
+    def test_analysis_matches_counter(self):
+        # A tie, so the first-seen tie-break is exercised
+        values = [5, 3] * 50
+        g = Grid(10, 10)
+        g.set_points(values)
+        stats = g.analysis()
+        expected_key, expected_count = Counter(values).most_common(1)[0]
+        self.assertEqual(stats['most_common_key'], expected_key)
+        self.assertEqual(stats['most_common_key_count'], expected_count)
+        self.assertEqual((stats['min_key'], stats['max_key'], stats['num_keys']), (3, 5, 2))
+        self.assertEqual(g.histogram(), Counter(values))
+
+    def test_repeated_patterns_match_single_search(self):
+        rng = np.random.default_rng(3)
+        for trial in range(40):
+            width, height = rng.integers(1, 40, size=2)
+            g = Grid(int(width), int(height))
+            # Tile short random patterns and sprinkle noise so every branch of
+            # the search (early success, late mismatch, too long) shows up
+            period = int(rng.integers(1, 20))
+            base = rng.integers(0, 3, size=(int(height), period))
+            values = np.tile(base, (1, int(width) // period + 1))[:, :width].copy()
+            noise = rng.random(values.shape) < 0.02
+            values[noise] = 7
+            g.set_points(values)
+            for vertical, count in ((True, g.width), (False, g.height)):
+                for maxlen in (1, 4, 16):
+                    expected = [g.repeated_pattern(i, vertical=vertical, maxlen=maxlen) is not None
+                                for i in range(count)]
+                    self.assertEqual(g.repeated_patterns(vertical, maxlen).tolist(), expected)
+
+if __name__ == '__main__':
+    unittest.main()
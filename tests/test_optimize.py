@@ -0,0 +1,82 @@
+import random
+import unittest
+from bitart.compute import ComputeContext
+from bitart.generator import FunctionMaker
+from bitart.optimize import canonical, canonical_form, count_nodes, simplify
+from bitart.parser import EquationParser
+
+EXTENT = 16
+
+def values(fn):
+    # Include negative coordinates so sign-dependent rules are exercised too
+    return [fn({'x': x, 'y': y}) for y in range(-EXTENT, EXTENT) for x in range(-EXTENT, EXTENT)]
+
+class TestSimplify(unittest.TestCase):
+    def check(self, equation, expected):
+        fn = EquationParser().parse(equation)
+        result, removed = simplify(fn)
+        self.assertEqual(str(result), expected)
+        self.assertEqual(removed, count_nodes(fn) - count_nodes(result))
+        self.assertEqual(values(result), values(fn), equation)
+
+    def test_rules(self):
+        self.check("3 * 7", "21")
+        self.check("x ^ x", "0")
+        self.check("y - y", "0")
+        self.check("~~x", "x")
+        self.check("-(-(x + 1))", "x + 1")
+        self.check("((x * y) % 5) % 5", "(x * y) % 5")
+        self.check("((x * y) % 0) % 0", "0")
+        self.check("(x | y) / (x | y)", "1")
+        self.check("(x + 0) * (1 * y)", "x * y")
+        self.check("0 - (x & -1)", "-x")
+        self.check("(x ^ (3 - 3)) | (y & 0)", "x")
+        self.check("x / -1", "-x")
+        self.check("(y - y) % x", "0")
+
+    def test_original_untouched(self):
+        fn = EquationParser().parse("(x ^ x) + y")
+        simplify(fn)
+        self.assertEqual(str(fn), "(x ^ x) + y")
+
+    def test_random_trees_keep_values(self):
+        random.seed(42)
+        for depth in range(1, 8):
+            for _ in range(20):
+                fn = FunctionMaker(depth=depth).make(random.choice([None, 3, 12]))
+                result, removed = simplify(fn)
+                self.assertGreaterEqual(removed, 0)
+                self.assertEqual(values(result), values(fn), str(fn))
+
+    def test_compute_reports_removed_nodes(self):
+        cc = ComputeContext(depth=2, scale_power=3)
+        fn = EquationParser().parse("(x ^ (3 * 7)) + (y - y)")
+        plain = ComputeContext(depth=2, scale_power=3, optimize=False).compute(fn)
+        self.assertEqual(cc.compute(fn).points.tolist(), plain.points.tolist())
+        self.assertEqual(cc.counters['nodes_removed'], 6)
+
+class TestCanonical(unittest.TestCase):
+    def same_form(self, a, b):
+        parse = EquationParser().parse
+        self.assertEqual(str(canonical_form(parse(a))), str(canonical_form(parse(b))))
+
+    def test_commutative_and_associative(self):
+        self.same_form("x ^ y", "y ^ x")
+        self.same_form("(x + 3) + (y + 4)", "(y + x) + 7")
+        self.same_form("((x & y) | 3) * (y - x)", "(y - x) * (3 | (y & x))")
+        self.same_form("x * (y * (x * 2))", "((2 * x) * x) * y")
+
+    def test_non_commutative_kept_apart(self):
+        parse = EquationParser().parse
+        self.assertNotEqual(str(canonical_form(parse("x - y"))), str(canonical_form(parse("y - x"))))
+        self.assertNotEqual(str(canonical_form(parse("x % (y + 1)"))), str(canonical_form(parse("(y + 1) % x"))))
+
+    def test_random_trees_keep_values(self):
+        rng = random.Random(17)
+        for depth in range(1, 8):
+            for _ in range(20):
+                fn = FunctionMaker(depth=depth, rng=rng).make(rng.choice([None, 3, 12]))
+                self.assertEqual(values(canonical(fn)), values(fn), str(fn))
+
+if __name__ == '__main__':
+    unittest.main()
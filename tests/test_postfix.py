@@ -0,0 +1,77 @@
+import pickle
+import random
+import unittest
+import numpy as np
+from bitart.compute import ComputeContext
+from bitart.function import Expression, Literal, Lookup
+from bitart.generator import FunctionMaker
+from bitart.parser import EquationParser
+from bitart.postfix import Postfix, tree_from_bytes
+from bitart.util import crunch64, uncrunch64
+
+EXTENT = 24
+
+class TestPostfix(unittest.TestCase):
+    def test_round_trips(self):
+        rng = random.Random(5)
+        for depth in range(0, 9):
+            fn = FunctionMaker(depth=depth, rng=rng, variables=('x', 'y', 't')).make(rng.choice([None, 7]))
+            postfix = Postfix.from_tree(fn)
+            self.assertEqual(repr(postfix.to_tree()), repr(fn))
+            self.assertEqual(Postfix.from_bytes(postfix.to_bytes()), postfix)
+            self.assertEqual(Postfix.from_equation(str(fn)), Postfix.from_tree(EquationParser().parse(str(fn))))
+            self.assertEqual(repr(pickle.loads(pickle.dumps(fn))), repr(fn))
+
+    def test_layout(self):
+        postfix = Postfix.from_equation("(x - 300) % -y")
+        self.assertEqual([postfix.code[i] for i in range(len(postfix))], [0, 3, 5, 1, 12, 11])
+        self.assertEqual(postfix.literals, (300,))
+        self.assertEqual(postfix.variables, {'x', 'y'})
+        self.assertEqual(str(postfix), "(x - 300) % (-y)")
+
+    def test_big_and_negative_literals(self):
+        fn = Expression('^', Literal(-(1 << 90)), Expression('+', Lookup('y'), Literal(-1)))
+        self.assertEqual(repr(tree_from_bytes(Postfix.from_tree(fn).to_bytes())), repr(fn))
+
+    def test_equality_and_hashing(self):
+        a, b = Postfix.from_equation("x ^ (y + 3)"), Postfix.from_equation("(x)^(y+3)")
+        self.assertEqual(a, b)
+        self.assertEqual(len({a, b, Postfix.from_equation("x ^ (y + 4)")}), 2)
+        self.assertNotEqual(a, Postfix.from_equation("(y + 3) ^ x"))
+
+    def test_rejects_bad_code(self):
+        with self.assertRaises(ValueError):
+            Postfix(bytes([0, 4]))
+        with self.assertRaises(ValueError):
+            Postfix(bytes([0, 1]))
+        with self.assertRaises(ValueError):
+            Postfix(bytes([3]), ())
+        with self.assertRaises(ValueError):
+            Postfix.from_bytes(Postfix.from_equation("x + 1").to_bytes()[:-1])
+
+    def test_metadata_encoding(self):
+        fn = EquationParser().parse("(x * 12345) & ~y")
+        text = crunch64(Postfix.from_tree(fn).to_bytes())
+        self.assertEqual(str(tree_from_bytes(uncrunch64(text))), str(fn))
+
+class TestStackEvaluation(unittest.TestCase):
+    def test_matches_tree(self):
+        xs = np.arange(EXTENT, dtype=np.int64)
+        context = {'x': xs.reshape(1, -1), 'y': xs.reshape(-1, 1), 't': np.int64(3)}
+        rng = random.Random(8)
+        for depth in range(1, 8):
+            for _ in range(10):
+                fn = FunctionMaker(depth=depth, rng=rng, variables=('x', 'y', 't')).make(rng.choice([None, 4, 11]))
+                expected = fn.evaluate_array(context)
+                values = Postfix.from_tree(fn).evaluate_array(context)
+                self.assertEqual(values.dtype, expected.dtype, str(fn))
+                self.assertTrue(np.array_equal(values, expected), str(fn))
+
+    def test_engine(self):
+        fn = EquationParser().parse("((x * y) ^ (x - y)) % 7")
+        expected = ComputeContext(depth=0, scale_power=2).compute(fn).values
+        self.assertTrue(np.array_equal(ComputeContext(depth=0, scale_power=2, engine='postfix').compute(fn).values,
+                                       expected))
+
+if __name__ == '__main__':
+    unittest.main()
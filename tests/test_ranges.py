@@ -0,0 +1,75 @@
+import random
+import unittest
+import numpy as np
+from bitart.function import Expression, _result_bounds
+from bitart.generator import FunctionMaker
+from bitart.parser import EquationParser
+from bitart.ranges import binary_range, dtype_for, unary_range
+
+OPS = dict(Expression.BIN_OPS)
+
+class TestRanges(unittest.TestCase):
+    def test_operator_ranges_are_sound(self):
+        rng = random.Random(5)
+        for _ in range(3000):
+            a = sorted(rng.randint(-40, 40) for _ in range(2))
+            b = sorted(rng.randint(-40, 40) for _ in range(2))
+            for op, func in OPS.items():
+                lo, hi = binary_range(op, a, b)
+                for _ in range(8):
+                    n, d = rng.randint(*a), rng.randint(*b)
+                    self.assertTrue(lo <= func(n, d) <= hi, (op, a, b, n, d, lo, hi))
+            for op, func in Expression.UN_OPS.items():
+                lo, hi = unary_range(op, a)
+                self.assertTrue(lo <= func(rng.randint(*a)) <= hi)
+
+    def test_safe_op_rules(self):
+        # 0/0 -> 1 and n/0 -> -1 both need to be covered
+        self.assertEqual(binary_range('/', (0, 0), (0, 0)), (1, 1))
+        self.assertEqual(binary_range('/', (3, 9), (0, 0)), (-1, -1))
+        self.assertEqual(binary_range('%', (-50, 50), (0, 0)), (0, 0))
+        self.assertEqual(binary_range('%', (0, 511), (7, 7)), (0, 6))
+
+    def test_tree_ranges_contain_values(self):
+        random.seed(8)
+        xs = np.arange(64, dtype=np.int64)
+        context = {'x': xs.reshape(1, -1), 'y': xs.reshape(-1, 1)}
+        ranges = {'x': (0, 63), 'y': (0, 63)}
+        for depth in range(1, 9):
+            for _ in range(15):
+                fn = FunctionMaker(depth=depth).make(random.choice([None, 6]))
+                lo, hi = fn.value_range(ranges)
+                values = fn.evaluate_array(context)
+                self.assertTrue(lo <= int(values.min()) and int(values.max()) <= hi, str(fn))
+
+    def test_narrowest_dtype(self):
+        xs = np.arange(512, dtype=np.int64)
+        context = {'x': xs.reshape(1, -1), 'y': xs.reshape(-1, 1)}
+        parse = EquationParser().parse
+        self.assertEqual(parse("(x ^ y) % 7").evaluate_array(context).dtype, np.int32)
+        self.assertEqual(parse("x * y * 65536").evaluate_array(context).dtype, np.int64)
+        self.assertEqual(parse("x * y * 18446744073709551616").evaluate_array(context).dtype, object)
+        # Huge intermediate, small result: only the product needs Python ints
+        fn = parse("(x * y * 18446744073709551616) % 13")
+        self.assertEqual(fn.evaluate_array(context).dtype, np.int32)
+        self.assertEqual(dtype_for(-(1 << 31), (1 << 31) - 1), np.int32)
+        self.assertEqual(dtype_for(0, 1 << 31), np.int64)
+
+class TestResultBounds(unittest.TestCase):
+    def test_bounds_contain_results(self):
+        rng = np.random.default_rng(4)
+        for _ in range(200):
+            lhs = np.sort(rng.integers(-50, 50, size=2))
+            rhs = np.sort(rng.integers(-50, 50, size=2))
+            bounds = {op: _result_bounds(op, lhs, rhs) for op in ('+', '-', '*', '/')}
+            for a in range(int(lhs[0]), int(lhs[1]) + 1):
+                for b in range(int(rhs[0]), int(rhs[1]) + 1):
+                    for op, (lo, hi) in bounds.items():
+                        value = Expression.BIN_OPS[op](a, b)
+                        self.assertTrue(lo <= value <= hi, (op, a, b, lo, hi))
+
+    def test_division_by_minus_one(self):
+        self.assertEqual(_result_bounds('/', np.array([5, 10]), np.array([-1, -1])), (-10, 10))
+
+if __name__ == '__main__':
+    unittest.main()
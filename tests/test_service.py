@@ -0,0 +1,68 @@
+import asyncio
+import io
+import json
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from bitart.service import RenderService, ServiceBusy, render_png
+
+class TestRenderService(unittest.TestCase):
+    def setUp(self):
+        self.service = RenderService(workers=2, cache_items=2, max_pending=2, executor=ThreadPoolExecutor(2))
+
+    def tearDown(self):
+        self.service.close()
+
+    def test_identical_requests_share_one_render(self):
+        async def burst():
+            return await asyncio.gather(*[self.service.render("x ^ y", 3) for _ in range(5)],
+                                        self.service.render("(x)^ y", 3))
+        results = asyncio.run(burst())
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(self.service.counters['computed'], 1)
+        self.assertEqual(self.service.counters['coalesced'], 5)
+
+        # Later repeats come from the cache
+        self.assertEqual(asyncio.run(self.service.render("x ^ y", 3)), results[0])
+        self.assertEqual(self.service.counters['cache_hits'], 1)
+        self.assertEqual(results[0], render_png("x ^ y", 3, None))
+
+    def test_backpressure(self):
+        async def burst():
+            return await asyncio.gather(*[self.service.render(f"(x * y) % {n}", 3) for n in range(2, 6)],
+                                        return_exceptions=True)
+        results = asyncio.run(burst())
+        self.assertEqual(sum(isinstance(r, ServiceBusy) for r in results), 2)
+        self.assertEqual(self.service.metrics()['rejected'], 2)
+        self.assertEqual(self.service.metrics()['pending'], 0)
+
+    def test_cache_is_bounded(self):
+        for n in range(2, 6):
+            asyncio.run(self.service.render(f"x % {n}", 3))
+        self.assertEqual(self.service.metrics()['cached'], 2)
+
+    def test_http(self):
+        async def get(port, target):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            response = await reader.read()
+            writer.close()
+            head, _, body = response.partition(b"\r\n\r\n")
+            return int(head.split()[1]), body
+
+        async def session():
+            server = await self.service.start(port=0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                return (await get(port, "/render?equation=x%20%5E%20y&zoom=3&color=red"),
+                        await get(port, "/render?equation=x%20%5E"),
+                        await get(port, "/render?equation=x&color=mauve"),
+                        await get(port, "/metrics"))
+
+        (ok, png), (bad, _), (bad_color, _), (ok_metrics, metrics) = asyncio.run(session())
+        self.assertEqual((ok, bad, bad_color, ok_metrics), (200, 400, 400, 200))
+        self.assertEqual(Image.open(io.BytesIO(png)).size, (512, 512))
+        self.assertEqual(json.loads(metrics)['computed'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
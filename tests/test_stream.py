@@ -0,0 +1,70 @@
+import io
+import unittest
+import numpy as np
+from PIL import Image
+from bitart.compute import ComputeContext
+from bitart.grid import Grid, Histogram
+from bitart.parser import EquationParser
+from bitart.stream import PNGWriter, StreamRenderer
+
+class TestStream(unittest.TestCase):
+    def test_matches_in_memory_render(self):
+        # Small palettes, an 8-bit one, and too many values for any palette
+        for equation in ("((x * y) ^ (x - y)) % 7", "(x * y) % 200", "(x * y) - 5"):
+            fn = EquationParser().parse(equation)
+            for mode in ('onebit', 'gradient', 'rgb'):
+                cc = ComputeContext(depth=2, scale_power=3, color_override=mode)
+                image, _, stats, _, _, _ = cc.render_custom(fn)
+
+                out = io.BytesIO()
+                renderer = StreamRenderer(cc, cc.extent, band_rows=5)
+                self.assertEqual(renderer.render(fn, mode, out), stats)
+                streamed = Image.open(io.BytesIO(out.getvalue())).convert('RGB')
+                self.assertEqual(streamed.tobytes(), image.convert('RGB').tobytes(), (equation, mode))
+
+    def test_writer_modes(self):
+        rng = np.random.default_rng(5)
+        for mode, colours in (('1', 2), ('L', 256), ('RGB', 256), ('P', 2), ('P', 3), ('P', 11), ('P', 200)):
+            shape = (21, 13, 3) if mode == 'RGB' else (21, 13)
+            # Smooth ramps, so both Sub and Up get chosen
+            rows = (np.add.outer(np.arange(21), np.arange(13)) * 3 % colours).astype(np.uint8)
+            if mode == 'RGB':
+                rows = np.stack([rows, rows[::-1], rng.integers(0, 256, rows.shape)], axis=-1).astype(np.uint8)
+            elif mode == '1':
+                rows = rows * 255
+            palette = rng.integers(0, 256, (colours, 3)).astype(np.uint8) if mode == 'P' else None
+
+            out = io.BytesIO()
+            writer = PNGWriter(out, 13, 21, mode=mode, palette=palette)
+            for start in range(0, 21, 8):
+                writer.write_rows(rows[start:start + 8])
+            writer.close()
+            image = Image.open(io.BytesIO(out.getvalue()))
+            self.assertEqual(image.mode, mode)
+            expected = palette[rows] if mode == 'P' else rows
+            self.assertTrue((np.asarray(image.convert('RGB' if mode in ('P', 'RGB') else 'L')) == expected).all(),
+                            (mode, colours))
+
+    def test_histogram_merge(self):
+        values = np.random.default_rng(0).integers(0, 9, size=(30, 20))
+        grid = Grid(20, 30)
+        grid.set_points(values)
+        merged = Histogram.of(values[:7].ravel())
+        for start in range(7, 30, 7):
+            merged = merged.merge(Histogram.of(values[start:start + 7].ravel(), offset=start * 20))
+        self.assertEqual(merged.analysis(), grid.analysis())
+
+    def test_too_many_keys_keeps_min_max(self):
+        fn = EquationParser().parse("x * y - 5")
+        cc = ComputeContext(depth=2, scale_power=3)
+        stats = StreamRenderer(cc, 64, band_rows=8, max_keys=100).statistics(fn)
+        self.assertEqual((stats['min_key'], stats['max_key']), (-5, 63 * 63 - 5))
+        self.assertIsNone(stats['num_keys'])
+        out = io.BytesIO()
+        StreamRenderer(cc, 64, band_rows=8, max_keys=100).render(fn, 'gradient', out, stats=stats)
+        self.assertEqual(Image.open(io.BytesIO(out.getvalue())).size, (512, 512))
+        with self.assertRaises(ValueError):
+            StreamRenderer(cc, 64, max_keys=100).render(fn, 'onebit', io.BytesIO(), stats=stats)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+import unittest
+from bitart.compute import ComputeContext
+from bitart.trace import NULL_TRACER, Tracer
+
+class TestTracer(unittest.TestCase):
+    def test_nested_stages(self):
+        tracer = Tracer()
+        with tracer.stage('outer', attempt=1):
+            with tracer.stage('inner'):
+                pass
+            with tracer.stage('inner'):
+                pass
+        summary = tracer.summary()
+        self.assertEqual(summary['inner']['calls'], 2)
+        self.assertEqual(summary['outer']['calls'], 1)
+        self.assertGreaterEqual(summary['outer']['wall_s'], summary['inner']['wall_s'])
+
+        trace = tracer.chrome_trace()
+        outer = [e for e in trace['traceEvents'] if e['name'] == 'outer'][0]
+        self.assertEqual(outer['ph'], 'X')
+        self.assertEqual(outer['args']['attempt'], 1)
+        self.assertIn('cpu_ms', outer['args'])
+
+    def test_exceptions_still_recorded(self):
+        tracer = Tracer()
+        with self.assertRaises(ValueError):
+            with tracer.stage('failing'):
+                raise ValueError
+        self.assertEqual(tracer.summary()['failing']['calls'], 1)
+
+    def test_null_tracer(self):
+        with NULL_TRACER.stage('anything', attempt=3) as stage:
+            self.assertIs(stage, NULL_TRACER.stage('other'))
+
+class TestComputeTracing(unittest.TestCase):
+    def test_search_stages_and_counts(self):
+        for workers in (1, 2):
+            tracer = Tracer()
+            cc = ComputeContext(depth=2, scale_power=2, seed=12, workers=workers, tracer=tracer)
+            cc.compute_and_render()
+            summary = tracer.summary()
+            self.assertEqual(summary['attempt']['calls'], cc.counters['attempts'], workers)
+            self.assertEqual(summary['render']['calls'], 1)
+            self.assertEqual(summary['compute']['calls'], cc.counters['full_evaluations'])
+            rejected = sum(n for key, n in cc.counters.items() if key.startswith('rejected_'))
+            self.assertEqual(rejected, cc.counters['attempts'] - 1)
+
+    def test_trace_file(self):
+        tracer = Tracer()
+        ComputeContext(depth=2, scale_power=3, tracer=tracer).compute_and_render()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            tracer.write_chrome_trace(path)
+            with open(path) as f:
+                events = json.load(f)['traceEvents']
+        self.assertTrue(all(e['dur'] >= 0 and e['ts'] >= 0 for e in events))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from PIL import Image
+from bitart.defaults import COLOR_MODES
+from bitart.colormap import colormap_names
+from bitart.worker import run_worker
+
+class TestWorker(unittest.TestCase):
+    def run_jobs(self, *jobs):
+        out = io.StringIO()
+        run_worker([json.dumps(job) if isinstance(job, dict) else job for job in jobs], out)
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_jobs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            eq_png, random_png = os.path.join(tmp, "eq.png"), os.path.join(tmp, "random.png")
+            results = self.run_jobs(
+                {'id': 1, 'output': eq_png, 'equation': "(x ^ y) % 5", 'zoom': 3, 'color': 'red'},
+                "",
+                {'id': 2, 'output': random_png, 'depth': 3, 'zoom': 3, 'seed': 12, 'metadata': False},
+                "not json",
+                {'id': 4, 'output': eq_png, 'equation': "x +"},
+            )
+            self.assertEqual([r['id'] for r in results], [1, 2, None, 4])
+            first, second, garbled, bad = results
+
+            self.assertTrue(first['ok'])
+            self.assertEqual(first['color_mode'], 'red')
+            self.assertEqual(first['stats']['num_keys'], 5)
+            self.assertIn('save', first['timings'])
+            self.assertTrue(os.path.exists(os.path.join(tmp, "eq.yaml")))
+            self.assertEqual(Image.open(eq_png).size, (512, 512))
+
+            self.assertTrue(second['ok'])
+            self.assertEqual(second['seed'], 12)
+            self.assertIn('attempt', second['timings'])
+            self.assertFalse(os.path.exists(os.path.join(tmp, "random.yaml")))
+
+            self.assertFalse(garbled['ok'])
+            self.assertFalse(bad['ok'])
+            self.assertIn("SyntaxError", bad['error'])
+
+class TestDefaults(unittest.TestCase):
+    def test_color_modes_match_registry(self):
+        self.assertEqual(list(COLOR_MODES), colormap_names())
+
+if __name__ == '__main__':
+    unittest.main()